@@ -0,0 +1,113 @@
+"""Cold-start benchmark: import time, app construction and time to first response.
+
+Each sample runs in a fresh interpreter so module caches don't hide import
+cost. Exits non-zero when the median time to first response exceeds the
+budget, so it can gate CI:
+
+    python bench_startup.py --runs 5 --budget-ms 1500
+"""
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, List
+
+import typer
+
+ROOT_DIR = Path(__file__).parent
+
+IMPORT_PROBE = """
+import json, time
+start = time.perf_counter()
+import server
+imported = time.perf_counter()
+server.create_app()
+created = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "create_app_ms": (created - imported) * 1000}))
+"""
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    # Motor connects lazily, so a placeholder URL is enough to measure startup
+    env.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    env.setdefault("DB_NAME", "startup_benchmark")
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import() -> Dict[str, float]:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE],
+        cwd=ROOT_DIR, env=_env(), capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_first_response(timeout: float = 30.0) -> float:
+    """Launch serve.py with one worker and poll until /api/ answers"""
+    port = _free_port()
+    env = _env()
+    env.update({"HOST": "127.0.0.1", "PORT": str(port), "WEB_CONCURRENCY": "1", "LOG_LEVEL": "warning"})
+    url = f"http://127.0.0.1:{port}/api/"
+
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "serve.py"], cwd=ROOT_DIR, env=env)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"Server did not answer within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    return {
+        "median": round(statistics.median(samples), 1),
+        "min": round(min(samples), 1),
+        "max": round(max(samples), 1),
+    }
+
+
+def main(
+    runs: int = typer.Option(5, help="Fresh interpreters per measurement"),
+    budget_ms: float = typer.Option(
+        float(os.environ.get("STARTUP_BUDGET_MS", 1500)),
+        help="Fail when the median time to first response exceeds this",
+    ),
+):
+    imports = [measure_import() for _ in range(runs)]
+    first_responses = [measure_first_response() for _ in range(runs)]
+
+    report = {
+        "runs": runs,
+        "import_ms": _summary([sample["import_ms"] for sample in imports]),
+        "create_app_ms": _summary([sample["create_app_ms"] for sample in imports]),
+        "first_response_ms": _summary(first_responses),
+        "budget_ms": budget_ms,
+    }
+    typer.echo(json.dumps(report, indent=2))
+
+    if report["first_response_ms"]["median"] > budget_ms:
+        typer.echo("Startup budget exceeded", err=True)
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    typer.run(main)
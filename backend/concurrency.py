@@ -0,0 +1,111 @@
+"""Request coalescing and load shedding for expensive read endpoints"""
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from fastapi import HTTPException
+
+
+class SingleFlight:
+    """Let concurrent identical calls share one in-flight computation.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same task instead of repeating it. Nothing is
+    cached once the task finishes.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._in_flight.get(key)
+        if task is None:
+            self.executed += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shield so one disconnecting client does not cancel the work for everyone else
+        return await asyncio.shield(task)
+
+    def coalesce(self, fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        """Decorate an endpoint so calls with the same arguments are coalesced"""
+        @functools.wraps(fn)
+        async def wrapper(**kwargs):
+            key = (fn.__qualname__, tuple(sorted(kwargs.items())))
+            return await self.do(key, lambda: fn(**kwargs))
+        return wrapper
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
+
+
+class ConcurrencyLimiter:
+    """Cap concurrent executions and shed load with 503 once the queue is full"""
+
+    def __init__(self, max_concurrent: int, max_queue: int, retry_after_seconds: int):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.retry_after_seconds = retry_after_seconds
+        self._semaphore = None
+        self._active = 0
+        self._waiting = 0
+        self.admitted = 0
+        self.shed = 0
+
+    def configure(self, max_concurrent: int, max_queue: int, retry_after_seconds: int) -> None:
+        """Apply limits from settings; must be called before the first request"""
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.retry_after_seconds = retry_after_seconds
+        self._semaphore = None
+
+    async def run(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if self._semaphore is None:
+            # Created lazily so it binds to the server's event loop, not the importer's
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            self.shed += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": str(self.retry_after_seconds)},
+            )
+
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        self.admitted += 1
+        self._active += 1
+        try:
+            return await fn()
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+
+    def limit(self, fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        """Decorate an endpoint so it runs under this limiter"""
+        @functools.wraps(fn)
+        async def wrapper(**kwargs):
+            return await self.run(lambda: fn(**kwargs))
+        return wrapper
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "queued": self._waiting,
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
@@ -0,0 +1,242 @@
+"""Highway corridor charger coverage: nearest-charger distances along a route.
+
+Existing locations are held in a uniform lat/lon grid index. Route points
+are densified to a fixed spacing, grouped by grid cell, and every group is
+compared with the sites in the neighbouring cells in one vectorized
+haversine call, so a national-highway route against 100k sites stays well
+under a second.
+"""
+import math
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+MAX_ROUTE_SAMPLES = 50000
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in km; arguments in degrees, broadcast like numpy arrays"""
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class SiteIndex:
+    """Uniform grid over site coordinates for radius-bounded nearest-site queries"""
+
+    def __init__(self, latitudes: np.ndarray, longitudes: np.ndarray, cell_km: float = 10.0):
+        self.cell_deg = cell_km / KM_PER_DEGREE_LAT
+        self.size = len(latitudes)
+        rows = np.floor(latitudes / self.cell_deg).astype(np.int64)
+        cols = np.floor(longitudes / self.cell_deg).astype(np.int64)
+        order = np.lexsort((cols, rows))
+        self.latitudes = latitudes[order]
+        self.longitudes = longitudes[order]
+        self._rows = rows[order]
+        self._cols = cols[order]
+        # Sites are sorted by (row, col), so each grid row is one contiguous slice
+        self._row_keys, self._row_starts = np.unique(self._rows, return_index=True)
+        self._row_ends = np.append(self._row_starts[1:], self.size)
+
+    def _candidates(self, row: int, col: int, reach_rows: int, reach_cols: int) -> np.ndarray:
+        lo = np.searchsorted(self._row_keys, row - reach_rows)
+        hi = np.searchsorted(self._row_keys, row + reach_rows, side="right")
+        slices = []
+        for start, end in zip(self._row_starts[lo:hi], self._row_ends[lo:hi]):
+            cols = self._cols[start:end]
+            first = start + np.searchsorted(cols, col - reach_cols)
+            last = start + np.searchsorted(cols, col + reach_cols, side="right")
+            if last > first:
+                slices.append(np.arange(first, last))
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int64)
+
+    def nearest_within(self, latitudes: np.ndarray, longitudes: np.ndarray, radius_km: float) -> np.ndarray:
+        """Distance from each point to its nearest site, or inf if none lies within radius_km.
+
+        Searches a small neighbourhood first and doubles it only for points that
+        found nothing, so dense areas never compare against far-away sites.
+        """
+        distances = np.full(len(latitudes), np.inf)
+        if self.size == 0 or len(latitudes) == 0:
+            return distances
+
+        pending = np.arange(len(latitudes))
+        search_km = min(self.cell_deg * KM_PER_DEGREE_LAT, radius_km)
+        while len(pending):
+            found = self._nearest_in_box(latitudes[pending], longitudes[pending], search_km)
+            # Anything at most search_km away lies inside the box, so these are exact
+            resolved = found <= search_km
+            distances[pending[resolved]] = found[resolved]
+            pending = pending[~resolved]
+            if search_km >= radius_km:
+                break
+            search_km = min(search_km * 2, radius_km)
+        return distances
+
+    def _nearest_in_box(self, latitudes: np.ndarray, longitudes: np.ndarray, search_km: float) -> np.ndarray:
+        nearest = np.full(len(latitudes), np.inf)
+        rows = np.floor(latitudes / self.cell_deg).astype(np.int64)
+        cols = np.floor(longitudes / self.cell_deg).astype(np.int64)
+        reach_rows = int(math.ceil(search_km / (self.cell_deg * KM_PER_DEGREE_LAT)))
+
+        cells, groups = np.unique(np.stack([rows, cols], axis=1), axis=0, return_inverse=True)
+        groups = groups.ravel()
+        for group, (row, col) in enumerate(cells):
+            members = np.flatnonzero(groups == group)
+            # A degree of longitude shrinks with latitude, so widen the column search
+            max_abs_lat = min(abs(latitudes[members]).max() + self.cell_deg, 89.0)
+            km_per_degree_lon = KM_PER_DEGREE_LAT * math.cos(math.radians(max_abs_lat))
+            reach_cols = int(math.ceil(search_km / (self.cell_deg * km_per_degree_lon)))
+
+            candidates = self._candidates(row, col, reach_rows, reach_cols)
+            if len(candidates):
+                nearest[members] = haversine_km(
+                    latitudes[members, None], longitudes[members, None],
+                    self.latitudes[None, candidates], self.longitudes[None, candidates],
+                ).min(axis=1)
+        return nearest
+
+
+def densify_route(route: Sequence[Tuple[float, float]], spacing_km: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Resample a polyline every spacing_km; returns (latitudes, longitudes, km along route)"""
+    points = np.asarray(route, dtype=float)
+    segment_km = haversine_km(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1])
+    cumulative = np.concatenate([[0.0], np.cumsum(segment_km)])
+    total = cumulative[-1]
+
+    samples = int(total // spacing_km) + 2
+    if samples > MAX_ROUTE_SAMPLES:
+        raise ValueError(
+            f"Route needs {samples} samples at {spacing_km} km spacing; increase sample_spacing_km"
+        )
+    along = np.unique(np.append(np.arange(0.0, total, spacing_km), total))
+    # Linear interpolation in degrees is accurate at kilometre-scale spacing
+    return np.interp(along, cumulative, points[:, 0]), np.interp(along, cumulative, points[:, 1]), along
+
+
+def _gaps(covered: np.ndarray, along: np.ndarray) -> List[Tuple[int, int]]:
+    """Index ranges [start, end] of consecutive uncovered samples"""
+    padded = np.concatenate([[False], ~covered, [False]])
+    changes = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    return list(zip(changes[0::2], changes[1::2] - 1))
+
+
+def analyze_corridor(
+    index: SiteIndex,
+    route: Sequence[Tuple[float, float]],
+    max_range_km: float,
+    coverage_radius_km: Optional[float] = None,
+    sample_spacing_km: float = 1.0,
+) -> Dict[str, Any]:
+    """Find stretches of a route with no charger in reach and suggest infill sites.
+
+    A route point counts as covered when a charger lies within
+    ``coverage_radius_km`` (half the vehicle range by default), which keeps
+    consecutive charging opportunities at most one range apart. Each gap is
+    filled with evenly spaced on-route sites, one per ``2 * coverage_radius_km``
+    of gap length.
+    """
+    started = time.perf_counter()
+    radius = coverage_radius_km or max_range_km / 2
+    latitudes, longitudes, along = densify_route(route, sample_spacing_km)
+    nearest = index.nearest_within(latitudes, longitudes, radius)
+    covered = np.isfinite(nearest)
+
+    gaps = []
+    infill = []
+    for start, end in _gaps(covered, along):
+        # A gap extends halfway to the neighbouring covered samples
+        gap_start = along[start] if start == 0 else (along[start - 1] + along[start]) / 2
+        gap_end = along[end] if end == len(along) - 1 else (along[end] + along[end + 1]) / 2
+        length = gap_end - gap_start
+        gaps.append({
+            "start_km": round(float(gap_start), 2),
+            "end_km": round(float(gap_end), 2),
+            "length_km": round(float(length), 2),
+            "start": {"latitude": float(np.interp(gap_start, along, latitudes)),
+                      "longitude": float(np.interp(gap_start, along, longitudes))},
+            "end": {"latitude": float(np.interp(gap_end, along, latitudes)),
+                    "longitude": float(np.interp(gap_end, along, longitudes))},
+        })
+
+        sites_needed = max(1, math.ceil(length / (2 * radius)))
+        for k in range(sites_needed):
+            position = gap_start + (k + 0.5) * length / sites_needed
+            infill.append({
+                "route_km": round(float(position), 2),
+                "latitude": float(np.interp(position, along, latitudes)),
+                "longitude": float(np.interp(position, along, longitudes)),
+            })
+
+    covered_distances = nearest[covered]
+    return {
+        "route_length_km": round(float(along[-1]), 2),
+        "max_range_km": max_range_km,
+        "coverage_radius_km": radius,
+        "sites_indexed": index.size,
+        "points_evaluated": len(along),
+        "covered_fraction": round(float(covered.mean()), 4),
+        "max_distance_to_charger_km": (
+            round(float(covered_distances.max()), 2) if covered.all() and len(covered_distances) else None
+        ),
+        "gaps": gaps,
+        "suggested_infill": infill,
+        "compute_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+class SiteIndexCache:
+    """Keeps the location index in memory between requests.
+
+    This process's location writes are merged into the cached index on the
+    next request, without reloading every coordinate from MongoDB. The index
+    is reloaded after max_age_seconds to pick up writes from other workers.
+    """
+
+    def __init__(self, max_age_seconds: float = 300):
+        self.max_age_seconds = max_age_seconds
+        self._index: Optional[SiteIndex] = None
+        self._built_at = 0.0
+        self._loading = False
+        self._pending: List[Tuple[float, float]] = []
+
+    def invalidate(self) -> None:
+        self._index = None
+        self._pending = []
+
+    def add(self, coordinates: Sequence[Tuple[float, float]]) -> None:
+        """Queue new (latitude, longitude) sites for the next get()"""
+        # With nothing cached the next get() loads them from the database anyway
+        if self._index is not None or self._loading:
+            self._pending.extend(coordinates)
+
+    async def get(self, db) -> SiteIndex:
+        if self._index is None or time.monotonic() - self._built_at > self.max_age_seconds:
+            # Sites added while the query runs are kept; a duplicate doesn't change any distance
+            self._pending = []
+            self._loading = True
+            try:
+                coordinates = await db.locations.find(
+                    {}, {"_id": 0, "latitude": 1, "longitude": 1}
+                ).to_list(None)
+            finally:
+                self._loading = False
+            self._index = SiteIndex(
+                np.array([site["latitude"] for site in coordinates], dtype=float),
+                np.array([site["longitude"] for site in coordinates], dtype=float),
+            )
+            self._built_at = time.monotonic()
+        if self._pending:
+            added = np.array(self._pending, dtype=float).reshape(-1, 2)
+            self._pending = []
+            self._index = SiteIndex(
+                np.concatenate([self._index.latitudes, added[:, 0]]),
+                np.concatenate([self._index.longitudes, added[:, 1]]),
+            )
+        return self._index
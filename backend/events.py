@@ -0,0 +1,148 @@
+"""In-process pub/sub of data changes, streamed to dashboards as server-sent events"""
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Collections whose inserts are pushed to dashboards
+WATCHED_COLLECTIONS = ["market_data", "locations", "competitors", "suppliers", "partnerships"]
+
+
+class Subscription:
+    """A client's bounded event queue.
+
+    When a slow client lets the queue fill up, pending events are replaced by
+    a single ``resync`` event, telling the client to refetch instead of
+    letting memory grow.
+    """
+
+    def __init__(self, max_queue: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.overflowed = 0
+
+    def offer(self, event: Dict[str, Any]) -> bool:
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync", "data": {"reason": "client fell behind"}})
+            self.overflowed += 1
+            return False
+
+
+class EventBroker:
+    """Fans change events out to every connected subscriber.
+
+    Events come from the create endpoints of this process, or from a MongoDB
+    change stream when the server is a replica set. The change stream also
+    sees writes made by other workers and pods.
+    """
+
+    def __init__(self, max_queue: int = 100, heartbeat_seconds: float = 15):
+        self.max_queue = max_queue
+        self.heartbeat_seconds = heartbeat_seconds
+        self.source = "local"
+        self._subscribers: Set[Subscription] = set()
+        self._watch_task: Optional[asyncio.Task] = None
+        self.published = 0
+        self.dropped = 0
+
+    def configure(self, max_queue: int, heartbeat_seconds: float) -> None:
+        self.max_queue = max_queue
+        self.heartbeat_seconds = heartbeat_seconds
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.max_queue)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> None:
+        event = {"type": event_type, "data": jsonable_encoder(data)}
+        self.published += 1
+        for subscription in list(self._subscribers):
+            if not subscription.offer(event):
+                self.dropped += 1
+
+    def publish_local(self, event_type: str, data: Dict[str, Any]) -> None:
+        """Publish a write made by this process, unless the change stream will report it"""
+        if self.source == "local":
+            self.publish(event_type, data)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+    async def stream(self, subscription: Subscription, is_disconnected) -> AsyncIterator[str]:
+        """Yield SSE frames for a subscription until the client goes away"""
+        try:
+            yield f"event: ready\ndata: {json.dumps({'source': self.source})}\n\n"
+            while not await is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    # Comment frame keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    async def start_change_stream(self, client, db, collections: List[str] = WATCHED_COLLECTIONS) -> None:
+        """Switch to change-stream events if MongoDB supports them"""
+        try:
+            hello = await client.admin.command("hello")
+        except PyMongoError:
+            logger.warning("Could not reach MongoDB, dashboard events stay process-local")
+            return
+        if "setName" not in hello and hello.get("msg") != "isdbgrid":
+            logger.info("MongoDB is not a replica set, dashboard events stay process-local")
+            return
+        self.source = "change_stream"
+        self._watch_task = asyncio.get_running_loop().create_task(self._watch(db, collections))
+
+    async def stop(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+
+    async def _watch(self, db, collections: List[str]) -> None:
+        pipeline = [{"$match": {"operationType": "insert", "ns.coll": {"$in": collections}}}]
+        resume_token = None
+        while True:
+            try:
+                async with db.watch(pipeline, resume_after=resume_token) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        document = change["fullDocument"]
+                        document.pop("_id", None)
+                        self.publish("insert", {
+                            "collection": change["ns"]["coll"],
+                            "document": document,
+                        })
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure:
+                logger.exception("Change stream rejected, falling back to process-local events")
+                self.source = "local"
+                return
+            except PyMongoError:
+                logger.exception("Change stream interrupted, resuming")
+                await asyncio.sleep(1)
+
@@ -0,0 +1,277 @@
+"""Columnar Parquet snapshot export of MongoDB collections for offline analytics"""
+import asyncio
+import json
+import shutil
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DEFAULT_BATCH_SIZE = 5000
+STATE_FILE = "_export_state.json"
+
+# created_at is set when a request arrives, not when the row is stored (write-behind
+# batches, several workers), so incremental runs re-read this far behind the watermark
+# and skip ids they already exported
+WATERMARK_OVERLAP = timedelta(minutes=10)
+
+# Arrow schemas mirror the Pydantic models in server.py
+EXPORT_SCHEMAS = {
+    "locations": pa.schema([
+        ("id", pa.string()),
+        ("name", pa.string()),
+        ("address", pa.string()),
+        ("latitude", pa.float64()),
+        ("longitude", pa.float64()),
+        ("location_type", pa.string()),
+        ("daily_traffic", pa.int64()),
+        ("nearby_amenities", pa.list_(pa.string())),
+        ("competition_within_5km", pa.int64()),
+        ("installation_cost", pa.float64()),
+        ("expected_daily_usage", pa.int64()),
+        ("revenue_potential", pa.float64()),
+        ("partnership_opportunity", pa.bool_()),
+        ("contact_info", pa.string()),
+        ("created_at", pa.timestamp("ms")),
+    ]),
+    "market_data": pa.schema([
+        ("id", pa.string()),
+        ("region", pa.string()),
+        ("city", pa.string()),
+        ("ev_adoption_rate", pa.float64()),
+        ("current_charging_stations", pa.int64()),
+        ("population", pa.int64()),
+        ("average_income", pa.float64()),
+        ("market_size_millions", pa.float64()),
+        ("growth_rate_percentage", pa.float64()),
+        ("competition_level", pa.string()),
+        ("created_at", pa.timestamp("ms")),
+    ]),
+}
+
+# Columns each collection may be hive-partitioned by
+PARTITION_COLUMNS = {
+    "locations": ["location_type"],
+    "market_data": ["city", "region"],
+}
+
+
+def _read_state(target: Path) -> Dict[str, Any]:
+    state_path = target / STATE_FILE
+    if not state_path.exists():
+        return {}
+    return json.loads(state_path.read_text())
+
+
+def _write_state(target: Path, state: Dict[str, Any]) -> None:
+    (target / STATE_FILE).write_text(json.dumps(state, indent=2))
+
+
+def _replace_directory(staging: Path, target: Path) -> None:
+    """Swap a finished staging directory in for target with two renames"""
+    previous = target.with_name(f".{target.name}-previous")
+    shutil.rmtree(previous, ignore_errors=True)
+    if target.exists():
+        target.rename(previous)
+    staging.rename(target)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def _coerce_row(row: Dict[str, Any], schema: pa.Schema) -> Dict[str, Any]:
+    # Sample data stores some float fields as ints, so coerce before building batches
+    coerced = {}
+    for field in schema:
+        value = row.get(field.name)
+        if value is not None and pa.types.is_floating(field.type):
+            value = float(value)
+        coerced[field.name] = value
+    return coerced
+
+
+class ParquetSink:
+    """Writes record batches to one Parquet file, or to a hive-partitioned dataset"""
+
+    def __init__(self, target: Path, collection: str, schema: pa.Schema,
+                 partition_by: Optional[str], run_id: str, compression: str):
+        self.target = target
+        self.schema = schema
+        self.partition_by = partition_by
+        self.run_id = run_id
+        self.compression = compression
+        self.files: List[str] = []
+        self._writer: Optional[pq.ParquetWriter] = None
+        self._path = target / f"{collection}-{run_id}.parquet"
+        self._batches_written = 0
+
+    def write(self, batch: pa.RecordBatch) -> None:
+        if self.partition_by:
+            pq.write_to_dataset(
+                pa.Table.from_batches([batch]),
+                root_path=str(self.target),
+                partition_cols=[self.partition_by],
+                basename_template=f"{self.run_id}-{self._batches_written}-{{i}}.parquet",
+                compression=self.compression,
+                file_visitor=lambda written: self.files.append(written.path),
+            )
+        else:
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(str(self._path), self.schema, compression=self.compression)
+                self.files.append(str(self._path))
+            self._writer.write_batch(batch)
+        self._batches_written += 1
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+async def export_collection(
+    db,
+    collection: str,
+    export_dir: Path,
+    partition_by: Optional[str] = None,
+    incremental: bool = True,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    compression: str = "zstd",
+) -> Dict[str, Any]:
+    """Stream a collection into compressed Parquet files, one Arrow record batch at a time.
+
+    With ``incremental`` set, only documents created after the previous run's
+    ``created_at`` watermark are exported and each run writes new files next to
+    the earlier ones, so the directory can be read as a single dataset. Rows
+    stored up to ``WATERMARK_OVERLAP`` after their ``created_at`` are still
+    picked up by the next run, without exporting any row twice. A full
+    export is built in a staging directory and then replaces the collection's
+    directory, so old incremental files are never read alongside it.
+    """
+    if collection not in EXPORT_SCHEMAS:
+        raise ValueError(f"Collection '{collection}' cannot be exported")
+    if partition_by and partition_by not in PARTITION_COLUMNS[collection]:
+        raise ValueError(
+            f"'{collection}' can only be partitioned by: {', '.join(PARTITION_COLUMNS[collection])}"
+        )
+
+    schema = EXPORT_SCHEMAS[collection]
+    target = export_dir / collection
+    run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+
+    if incremental:
+        target.mkdir(parents=True, exist_ok=True)
+        state = _read_state(target)
+        if state and state.get("partition_by") != partition_by:
+            raise ValueError(
+                f"Existing '{collection}' export is partitioned by {state.get('partition_by') or 'nothing'}; "
+                f"run a full export to change partitioning"
+            )
+        output = target
+    else:
+        state = {}
+        output = export_dir / f".{collection}-{run_id}"
+        output.mkdir(parents=True)
+    watermark = state.get("last_created_at")
+    # Ids exported within WATERMARK_OVERLAP of the watermark, with their created_at
+    recent = {
+        row_id: datetime.fromisoformat(created_at)
+        for row_id, created_at in state.get("recent_ids", {}).items()
+    }
+    latest_created_at = datetime.fromisoformat(watermark) if watermark else None
+    query: Dict[str, Any] = {}
+    if latest_created_at:
+        query["created_at"] = {"$gt": latest_created_at - WATERMARK_OVERLAP}
+
+    sink = ParquetSink(output, collection, schema, partition_by, run_id, compression)
+    loop = asyncio.get_running_loop()
+
+    cursor = (
+        db[collection]
+        .find(query, {"_id": 0})
+        .sort("created_at", 1)
+        .batch_size(batch_size)
+    )
+
+    rows_written = 0
+    rows: List[Dict[str, Any]] = []
+
+    async def write_rows():
+        nonlocal rows_written, latest_created_at, recent
+        batch = pa.RecordBatch.from_pylist(rows, schema=schema)
+        await loop.run_in_executor(None, sink.write, batch)
+        rows_written += len(rows)
+        for row in rows:
+            if row["created_at"] is not None:
+                recent[row["id"]] = row["created_at"]
+                latest_created_at = max(latest_created_at or row["created_at"], row["created_at"])
+        if latest_created_at is not None:
+            recent = {
+                row_id: created_at for row_id, created_at in recent.items()
+                if created_at > latest_created_at - WATERMARK_OVERLAP
+            }
+
+    try:
+        async for document in cursor:
+            if document.get("id") in recent:
+                continue
+            rows.append(_coerce_row(document, schema))
+            if len(rows) >= batch_size:
+                await write_rows()
+                rows = []
+        if rows:
+            await write_rows()
+    except BaseException:
+        await loop.run_in_executor(None, sink.close)
+        if not incremental:
+            shutil.rmtree(output, ignore_errors=True)
+        raise
+    await loop.run_in_executor(None, sink.close)
+
+    if rows_written or not incremental:
+        watermark = latest_created_at.isoformat() if latest_created_at else None
+        _write_state(output, {
+            "last_created_at": watermark,
+            "recent_ids": {row_id: created_at.isoformat() for row_id, created_at in recent.items()},
+            "last_run_id": run_id,
+            "partition_by": partition_by,
+        })
+
+    files = sink.files
+    if not incremental:
+        await loop.run_in_executor(None, _replace_directory, output, target)
+        files = [str(target / Path(path).relative_to(output)) for path in files]
+
+    return {
+        "collection": collection,
+        "rows_exported": rows_written,
+        "files": files,
+        "partition_by": partition_by,
+        "incremental": incremental,
+        "watermark": watermark,
+    }
+
+
+if __name__ == "__main__":
+    import typer
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from settings import Settings
+
+    def main(
+        collection: str,
+        partition_by: Optional[str] = typer.Option(None, help="Hive partition column"),
+        full: bool = typer.Option(False, help="Ignore the watermark and export every document"),
+        batch_size: int = typer.Option(DEFAULT_BATCH_SIZE),
+    ):
+        """Export a collection to Parquet, e.g. from a daily cron job"""
+        settings = Settings.from_env()
+        client = AsyncIOMotorClient(settings.mongo_url)
+        try:
+            result = asyncio.run(export_collection(
+                client[settings.db_name], collection, settings.export_dir,
+                partition_by=partition_by, incremental=not full, batch_size=batch_size,
+            ))
+        finally:
+            client.close()
+        typer.echo(json.dumps(result, indent=2))
+
+    typer.run(main)
@@ -0,0 +1,138 @@
+"""Precomputed multi-resolution demand heatmap tiles built from location analyses.
+
+Tiles follow the Web Mercator z/x/y scheme used by map libraries. Each tile
+is split into a CELLS_PER_SIDE x CELLS_PER_SIDE grid and every cell keeps
+running totals, so a new location only increments one cell per zoom level.
+
+A tile's ETag combines its ``epoch``, taken from the clock whenever the tile
+document is created, with its ``version``, bumped on every update. A tile that
+is deleted and created again therefore never repeats an earlier ETag.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Tuple
+
+from pymongo import ReplaceOne, UpdateOne
+
+MIN_ZOOM = 0
+MAX_ZOOM = 14
+CELLS_PER_SIDE = 16
+MAX_LATITUDE = 85.05112878
+
+METRICS = ("daily_traffic", "expected_daily_usage", "revenue_potential")
+
+
+def tile_cell(latitude: float, longitude: float, zoom: int) -> Tuple[int, int, int, int]:
+    """Return (x, y, cell_x, cell_y) of the tile and cell containing a point"""
+    latitude = max(min(latitude, MAX_LATITUDE), -MAX_LATITUDE)
+    scale = 2 ** zoom
+    world_x = (longitude + 180.0) / 360.0 * scale
+    lat_rad = math.radians(latitude)
+    world_y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * scale
+
+    x = min(max(int(world_x), 0), scale - 1)
+    y = min(max(int(world_y), 0), scale - 1)
+    cell_x = min(int((world_x - x) * CELLS_PER_SIDE), CELLS_PER_SIDE - 1)
+    cell_y = min(int((world_y - y) * CELLS_PER_SIDE), CELLS_PER_SIDE - 1)
+    return x, y, cell_x, cell_y
+
+
+def clock_version(now: datetime) -> int:
+    return int(now.timestamp() * 1000)
+
+
+def etag(z: int, x: int, y: int, tile: Dict[str, Any]) -> str:
+    if not tile:
+        return f'"{z}-{x}-{y}-0"'
+    return f'"{z}-{x}-{y}-{tile.get("epoch", 0)}-{tile["version"]}"'
+
+
+def _cell_key(cell_x: int, cell_y: int) -> str:
+    return f"{cell_x}_{cell_y}"
+
+
+def location_updates(locations: Iterable[Dict[str, Any]]) -> List[UpdateOne]:
+    """Upserts that add the given locations to every zoom level's tiles"""
+    increments: Dict[Tuple[int, int, int], Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+    for location in locations:
+        for zoom in range(MIN_ZOOM, MAX_ZOOM + 1):
+            x, y, cell_x, cell_y = tile_cell(location["latitude"], location["longitude"], zoom)
+            cell = f"cells.{_cell_key(cell_x, cell_y)}"
+            tile = increments[(zoom, x, y)]
+            tile[f"{cell}.count"] += 1
+            for metric in METRICS:
+                tile[f"{cell}.{metric}"] += location.get(metric, 0)
+
+    now = datetime.utcnow()
+    # version can't be both $inc'd and $setOnInsert'ed, so new tiles get a fresh epoch instead
+    return [
+        UpdateOne(
+            {"z": z, "x": x, "y": y},
+            {"$inc": {**inc, "version": 1}, "$set": {"updated_at": now},
+             "$setOnInsert": {"epoch": clock_version(now)}},
+            upsert=True,
+        )
+        for (z, x, y), inc in increments.items()
+    ]
+
+
+async def add_locations(db, locations: List[Dict[str, Any]]) -> None:
+    """Fold newly inserted locations into the stored tiles"""
+    updates = location_updates(locations)
+    if updates:
+        await db.heatmap_tiles.bulk_write(updates, ordered=False)
+
+
+async def rebuild_tiles(db, batch_size: int = 5000) -> int:
+    """Recompute every tile from the locations collection"""
+    # Taken before reading so tiles updated incrementally while the cursor runs are recognisable.
+    # The version restarts from the clock so ETags issued before the rebuild stop matching.
+    started = datetime.utcnow()
+    version = clock_version(started)
+    tiles: Dict[Tuple[int, int, int], Dict[str, Dict[str, float]]] = defaultdict(
+        lambda: defaultdict(lambda: defaultdict(int))
+    )
+    projection = {"_id": 0, "latitude": 1, "longitude": 1, **{metric: 1 for metric in METRICS}}
+    async for location in db.locations.find({}, projection).batch_size(batch_size):
+        for zoom in range(MIN_ZOOM, MAX_ZOOM + 1):
+            x, y, cell_x, cell_y = tile_cell(location["latitude"], location["longitude"], zoom)
+            cell = tiles[(zoom, x, y)][_cell_key(cell_x, cell_y)]
+            cell["count"] += 1
+            for metric in METRICS:
+                cell[metric] += location.get(metric, 0)
+
+    # Upsert first and then drop tiles this run did not write, so readers never see an empty heatmap
+    now = datetime.utcnow()
+    if tiles:
+        await db.heatmap_tiles.bulk_write([
+            ReplaceOne(
+                {"z": z, "x": x, "y": y},
+                {"z": z, "x": x, "y": y, "cells": cells, "version": version, "epoch": version,
+                 "rebuild": version, "updated_at": now},
+                upsert=True,
+            )
+            for (z, x, y), cells in tiles.items()
+        ], ordered=False)
+    # add_locations bumps version, so mark this run's tiles separately, and keep tiles
+    # created or updated by add_locations after the rebuild started
+    await db.heatmap_tiles.delete_many({"rebuild": {"$ne": version}, "updated_at": {"$lt": started}})
+    return len(tiles)
+
+
+def tile_response(z: int, x: int, y: int, tile: Dict[str, Any]) -> Dict[str, Any]:
+    cells = []
+    for key, totals in (tile or {}).get("cells", {}).items():
+        cell_x, cell_y = (int(part) for part in key.split("_"))
+        cells.append({"cell_x": cell_x, "cell_y": cell_y, **totals})
+    return {
+        "z": z,
+        "x": x,
+        "y": y,
+        "cells_per_side": CELLS_PER_SIDE,
+        "cells": cells,
+        "max": {
+            metric: max((cell.get(metric, 0) for cell in cells), default=0)
+            for metric in ("count",) + METRICS
+        },
+    }
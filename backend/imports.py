@@ -0,0 +1,202 @@
+"""Streaming CSV/Excel import of site surveys and supplier catalogs"""
+import asyncio
+import codecs
+import csv
+import zipfile
+from itertools import islice
+from typing import (
+    Any, Awaitable, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple, Type, Union, get_args, get_origin
+)
+
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+from pydantic import BaseModel, ValidationError
+from pymongo.errors import BulkWriteError
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_REJECTIONS = 200
+LIST_SEPARATOR = ";"
+
+
+def iter_csv_rows(fileobj: BinaryIO) -> Iterator[Dict[str, Any]]:
+    reader = csv.DictReader(codecs.iterdecode(fileobj, "utf-8-sig"))
+    for row in reader:
+        yield row
+
+
+def iter_excel_rows(fileobj: BinaryIO) -> Iterator[Dict[str, Any]]:
+    try:
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, KeyError) as e:
+        # Not a zip at all, or a zip without the workbook parts openpyxl looks up
+        raise InvalidFileException(str(e)) from e
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else "" for cell in next(rows, ())]
+        for values in rows:
+            yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def iter_rows(filename: str, fileobj: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """Yield one dict per data row, choosing the parser from the file extension"""
+    suffix = filename.lower().rsplit(".", 1)[-1] if "." in filename else ""
+    if suffix == "csv":
+        return iter_csv_rows(fileobj)
+    if suffix in ("xlsx", "xlsm"):
+        return iter_excel_rows(fileobj)
+    raise ValueError("Unsupported file type, upload a .csv or .xlsx file")
+
+
+def _is_str_field(annotation: Any) -> bool:
+    if get_origin(annotation) is Union:
+        return str in get_args(annotation)
+    return annotation is str
+
+
+def _cell_text(value: Any) -> str:
+    # Excel stores phone numbers and numeric ids as numbers, often as floats
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def normalize_row(row: Dict[str, Any], model: Type[BaseModel]) -> Dict[str, Any]:
+    """Turn raw cell values into something the model can validate.
+
+    Blank cells become missing values, except list fields which are split on
+    ``;`` and default to an empty list. Numeric cells in text fields become
+    text. Unknown columns are dropped.
+    """
+    normalized = {}
+    for name, field in model.model_fields.items():
+        value = row.get(name)
+        if isinstance(value, str):
+            value = value.strip()
+            if value == "":
+                value = None
+        if get_origin(field.annotation) is list:
+            if value is None:
+                value = []
+            elif not isinstance(value, list):
+                value = [item.strip() for item in _cell_text(value).split(LIST_SEPARATOR) if item.strip()]
+        elif value is not None and not isinstance(value, str) and _is_str_field(field.annotation):
+            value = _cell_text(value)
+        if value is None:
+            continue
+        normalized[name] = value
+    return normalized
+
+
+def read_chunk(rows: Iterator[Dict[str, Any]], chunk_size: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Read up to ``chunk_size`` rows, stopping early with a reason if the file can't be parsed"""
+    chunk = []
+    try:
+        for row in islice(rows, chunk_size):
+            chunk.append(row)
+    except UnicodeDecodeError:
+        # Excel's plain "CSV" export is usually cp1252 rather than UTF-8
+        return chunk, "the file is not UTF-8 encoded, save it as \"CSV UTF-8\""
+    except csv.Error as e:
+        return chunk, f"malformed CSV ({e})"
+    except InvalidFileException:
+        return chunk, "the file is not a valid .xlsx workbook"
+    return chunk, None
+
+
+class ImportAborted(ValueError):
+    """The file stopped parsing partway; ``report`` covers the rows imported before that"""
+
+    def __init__(self, message: str, report: Dict[str, Any]):
+        super().__init__(message)
+        self.report = report
+
+
+class ImportReport:
+    def __init__(self, collection: str):
+        self.collection = collection
+        self.rows_processed = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.rejected_rows: List[Dict[str, Any]] = []
+
+    def reject(self, row_number: int, errors: List[str]) -> None:
+        self.rejected += 1
+        if len(self.rejected_rows) < MAX_REPORTED_REJECTIONS:
+            self.rejected_rows.append({"row": row_number, "errors": errors})
+
+    def dict(self) -> Dict[str, Any]:
+        return {
+            "collection": self.collection,
+            "rows_processed": self.rows_processed,
+            "inserted": self.inserted,
+            "rejected": self.rejected,
+            "rejected_rows": self.rejected_rows,
+            "rejected_rows_truncated": self.rejected > len(self.rejected_rows),
+        }
+
+
+async def import_rows(
+    collection,
+    rows: Iterator[Dict[str, Any]],
+    schema: Type[BaseModel],
+    build: Callable[[BaseModel], BaseModel],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_inserted: Optional[Callable[[List[Dict[str, Any]]], Awaitable[Any]]] = None,
+) -> Dict[str, Any]:
+    """Validate and insert rows chunk by chunk so memory stays bounded by ``chunk_size``.
+
+    Invalid rows and rows the database refuses are reported instead of
+    aborting the import. Row numbers follow the spreadsheet, with the header
+    on row 1. ``on_inserted`` receives the documents written from each chunk.
+
+    Raises ImportAborted if the file stops parsing partway; rows before that
+    point have already been imported.
+    """
+    report = ImportReport(collection.name)
+    loop = asyncio.get_running_loop()
+    row_number = 1
+
+    while True:
+        # Parsing reads from the upload's temporary file, so keep it off the event loop
+        chunk, read_error = await loop.run_in_executor(None, read_chunk, rows, chunk_size)
+        if not chunk and read_error is None:
+            break
+
+        documents = []
+        document_rows = []
+        for raw in chunk:
+            row_number += 1
+            report.rows_processed += 1
+            try:
+                documents.append(build(schema(**normalize_row(raw, schema))).dict())
+                document_rows.append(row_number)
+            except ValidationError as e:
+                report.reject(row_number, [
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                    for error in e.errors()
+                ])
+
+        if documents:
+            failed = set()
+            try:
+                await collection.insert_many(documents, ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get("writeErrors", []):
+                    failed.add(error["index"])
+                    report.reject(document_rows[error["index"]], [error.get("errmsg", "Write failed")])
+
+            inserted = [document for index, document in enumerate(documents) if index not in failed]
+            report.inserted += len(inserted)
+            if on_inserted and inserted:
+                await on_inserted(inserted)
+
+        if read_error is not None:
+            raise ImportAborted(
+                f"Could not read row {row_number + 1}: {read_error}. "
+                f"{report.rows_processed} rows were processed and {report.inserted} inserted before it",
+                report.dict()
+            )
+
+    return report.dict()
@@ -0,0 +1,120 @@
+"""Opt-in per-request sampling profiler.
+
+Requests are profiled when they carry the configured ``X-Profile-Token``
+header or are picked by the sample rate. Profiles are recorded with
+pyinstrument in async mode, so time spent awaiting MongoDB shows up under the
+frame that awaited it. They are stored in the ``request_profiles``
+collection and rendered as a flame graph when retrieved. When profiling is
+disabled the middleware is not installed at all.
+"""
+import asyncio
+import logging
+import random
+import secrets
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile-token"
+
+# Long-lived streams and the profile viewer itself are never profiled
+EXCLUDED_PREFIXES = ("/api/events", "/api/admin/profiles")
+
+RENDER_FORMATS = {
+    "speedscope": "application/json",
+    "html": "text/html",
+    "text": "text/plain",
+}
+
+
+def token_matches(provided: Optional[str], expected: Optional[str]) -> bool:
+    return bool(provided and expected and secrets.compare_digest(provided, expected))
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles selected requests and stores the result"""
+
+    def __init__(self, app, store: Callable[[Dict[str, Any]], Awaitable[Any]], token: Optional[str],
+                 sample_rate: float, interval: float = 0.001):
+        # Fail at startup rather than on the first profiled request
+        from pyinstrument import Profiler
+
+        self.app = app
+        self.store = store
+        self.token = token
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self._profiler_class = Profiler
+        self._pending: Set[asyncio.Task] = set()
+
+    def _trigger(self, scope) -> Optional[str]:
+        if scope["type"] != "http" or scope["path"].startswith(EXCLUDED_PREFIXES):
+            return None
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER.encode() and token_matches(value.decode(), self.token):
+                    return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = self._trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        profiler = self._profiler_class(interval=self.interval, async_mode="enabled")
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            duration_ms = (time.perf_counter() - started) * 1000
+            # Store after the response so profiling doesn't add write latency to the request
+            task = asyncio.get_running_loop().create_task(self._store(
+                scope, trigger, status["code"], duration_ms, profiler.last_session
+            ))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _store(self, scope, trigger: str, status_code: Optional[int], duration_ms: float, session) -> None:
+        try:
+            await self.store({
+                "id": str(uuid.uuid4()),
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope["query_string"].decode(),
+                "status_code": status_code,
+                "duration_ms": duration_ms,
+                "trigger": trigger,
+                "sample_count": session.sample_count,
+                "session": session.to_json(),
+                "created_at": datetime.utcnow(),
+            })
+        except Exception:
+            logger.exception("Failed to store request profile")
+
+
+def render_profile(profile: Dict[str, Any], fmt: str) -> str:
+    """Render a stored profile as a speedscope flame graph, pyinstrument HTML or text"""
+    from pyinstrument.renderers import ConsoleRenderer, HTMLRenderer, SpeedscopeRenderer
+    from pyinstrument.session import Session
+
+    session = Session.from_json(profile["session"])
+    if fmt == "speedscope":
+        return SpeedscopeRenderer().render(session)
+    if fmt == "html":
+        return HTMLRenderer().render(session)
+    return ConsoleRenderer(unicode=True, color=False, show_all=False).render(session)
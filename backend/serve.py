@@ -0,0 +1,62 @@
+"""Production launcher: runs the app factory under uvicorn or gunicorn with several workers"""
+import importlib.util
+import logging
+import os
+
+import uvicorn
+
+from settings import Settings
+
+logger = logging.getLogger(__name__)
+
+APP_FACTORY = "server:create_app"
+
+
+def _with_fallback(choice: str) -> str:
+    # uvloop and httptools are optional speedups (uvloop has no Windows build)
+    if choice in ("uvloop", "httptools") and importlib.util.find_spec(choice) is None:
+        logger.warning("%s is not installed, letting uvicorn pick a fallback", choice)
+        return "auto"
+    return choice
+
+
+def run_uvicorn(settings: Settings) -> None:
+    uvicorn.run(
+        APP_FACTORY,
+        factory=True,
+        host=settings.host,
+        port=settings.port,
+        workers=settings.workers,
+        loop=_with_fallback(settings.loop),
+        http=_with_fallback(settings.http),
+        log_level=settings.log_level,
+        timeout_keep_alive=settings.timeout_keep_alive,
+        proxy_headers=True,
+    )
+
+
+def run_gunicorn(settings: Settings) -> None:
+    # UvicornWorker picks uvloop/httptools automatically when they are installed.
+    # No --preload: each worker must open its own Motor client after forking.
+    os.execvp("gunicorn", [
+        "gunicorn",
+        f"{APP_FACTORY}()",
+        "--worker-class", "uvicorn.workers.UvicornWorker",
+        "--workers", str(settings.workers),
+        "--bind", f"{settings.host}:{settings.port}",
+        "--log-level", settings.log_level,
+        "--keep-alive", str(settings.timeout_keep_alive),
+    ])
+
+
+def main() -> None:
+    settings = Settings.from_env()
+    logging.basicConfig(level=settings.log_level.upper())
+    if settings.process_manager == "gunicorn":
+        run_gunicorn(settings)
+    else:
+        run_uvicorn(settings)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,45 @@
-from fastapi import FastAPI, APIRouter, HTTPException
-from dotenv import load_dotenv
+from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Request, Header
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from pymongo import ASCENDING, UpdateOne
+import asyncio
+import functools
+import inspect
 import logging
-from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import uuid
 from datetime import datetime, date
 from enum import Enum
+from concurrency import SingleFlight, ConcurrencyLimiter
+from events import EventBroker
+from write_behind import WriteBehindBuffer
+import heatmap
+from profiling import ProfilingMiddleware, RENDER_FORMATS, render_profile, token_matches
+from settings import Settings
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
-
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+logger = logging.getLogger(__name__)
 
-# Create the main app without a prefix
-app = FastAPI(title="EV Charging Station Business Platform", version="1.0.0")
+# Configured by create_app() so importing this module stays cheap and side-effect free
+settings: Optional[Settings] = None
+client: Optional[AsyncIOMotorClient] = None
+db = None
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Identical concurrent requests to expensive endpoints share one computation,
+# and requests beyond the queue limit are rejected with 503 + Retry-After
+single_flight = SingleFlight()
+heavy_limiter = ConcurrencyLimiter(max_concurrent=8, max_queue=32, retry_after_seconds=2)
+
+# Pushes inserts to dashboards over server-sent events
+event_broker = EventBroker()
+
+# Batches location and market data inserts when WRITE_BEHIND_ENABLED is set
+write_buffer = WriteBehindBuffer()
+
 # Enums
 class ChargingStationType(str, Enum):
     LEVEL_1 = "Level 1 (AC 120V)"
@@ -168,6 +183,16 @@ class RegulatoryInfo(BaseModel):
     authority: str
     last_updated: datetime = Field(default_factory=datetime.utcnow)
 
+class RegulatoryComplianceSummary(BaseModel):
+    state: str
+    total_requirements: int
+    total_fees: float
+    max_processing_time_days: int
+    regulation_types: List[str]
+    authorities: List[str]
+    is_default: bool = False
+    last_updated: datetime = Field(default_factory=datetime.utcnow)
+
 # Create Models
 class MarketDataCreate(BaseModel):
     region: str
@@ -208,17 +233,67 @@ class FinancialModelCreate(BaseModel):
     monthly_maintenance: float
     staff_cost_monthly: float
 
+class RegulatoryComplianceBatchRequest(BaseModel):
+    states: List[str] = Field(..., min_length=1, max_length=100)
+
+class CorridorAnalysisRequest(BaseModel):
+    route: List[Tuple[float, float]] = Field(..., min_length=2, max_length=10000)
+    max_range_km: float = Field(..., gt=0)
+    coverage_radius_km: Optional[float] = Field(None, gt=0)
+    sample_spacing_km: float = Field(1.0, gt=0)
+
+class TouPeriod(BaseModel):
+    name: str
+    price_per_kwh: float = Field(..., ge=0)
+    start_hour: int = Field(..., ge=0, le=23)
+    end_hour: int = Field(..., ge=0, le=24)
+    weekdays_only: bool = False
+    months: Optional[List[int]] = None
+
+class TouTariff(BaseModel):
+    base_price_per_kwh: float = Field(..., ge=0)
+    demand_charge_per_kw: float = Field(0.0, ge=0)
+    periods: List[TouPeriod] = []
+
+class StationSimulationInput(BaseModel):
+    name: str
+    station_type: ChargingStationType
+    location_type: LocationType = LocationType.COMMERCIAL
+    connectors: int = Field(..., ge=1, le=64)
+    charger_power_kw: Optional[float] = Field(None, gt=0)
+    daily_sessions: float = Field(..., ge=0)
+    average_session_kwh: float = Field(..., gt=0)
+    charging_price_per_kwh: float = Field(..., ge=0)
+    fixed_costs_monthly: float = 0.0
+
+class TariffSimulationRequest(BaseModel):
+    stations: List[StationSimulationInput] = Field(..., min_length=1, max_length=1000)
+    tariff: TouTariff
+    year: int = Field(2025, ge=2000, le=2100)
+
+class BatchSubRequest(BaseModel):
+    id: Optional[str] = None
+    operation: str
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest] = Field(..., min_length=1, max_length=20)
+
 # Basic API Routes
 @api_router.get("/")
 async def root():
     return {"message": "EV Charging Station Business Platform API", "version": "1.0.0"}
 
 # Market Research APIs
+async def _after_market_data_written(documents: List[Dict[str, Any]]):
+    for document in documents:
+        event_broker.publish_local("insert", {"collection": "market_data", "document": document})
+
 @api_router.post("/market-data", response_model=MarketData)
 async def create_market_data(input: MarketDataCreate):
     market_dict = input.dict()
     market_obj = MarketData(**market_dict)
-    await db.market_data.insert_one(market_obj.dict())
+    await write_buffer.insert("market_data", market_obj.dict())
     return market_obj
 
 @api_router.get("/market-data", response_model=List[MarketData])
@@ -227,9 +302,11 @@ async def get_market_data():
     return [MarketData(**data) for data in market_data]
 
 @api_router.get("/market-analysis/{city}")
+@single_flight.coalesce
+@heavy_limiter.limit
 async def get_market_analysis(city: str):
     """Get comprehensive market analysis for a specific city"""
-    market_data = await db.market_data.find_one({"city": city})
+    market_data = await db.market_data.find_one({"city": city}, {"_id": 0})
     
     if not market_data:
         raise HTTPException(status_code=404, detail="Market data not found for this city")
@@ -254,11 +331,17 @@ async def get_market_analysis(city: str):
     return analysis
 
 # Location Analysis APIs
+async def _after_locations_written(documents: List[Dict[str, Any]]):
+    # Heatmap tiles and the corridor index follow the documents once they are stored
+    await _after_location_import(documents)
+    for document in documents:
+        event_broker.publish_local("insert", {"collection": "locations", "document": document})
+
 @api_router.post("/locations", response_model=LocationAnalysis)
 async def create_location(input: LocationAnalysisCreate):
     location_dict = input.dict()
     location_obj = LocationAnalysis(**location_dict)
-    await db.locations.insert_one(location_obj.dict())
+    await write_buffer.insert("locations", location_obj.dict())
     return location_obj
 
 @api_router.get("/locations", response_model=List[LocationAnalysis])
@@ -269,7 +352,7 @@ async def get_locations():
 @api_router.get("/location-analysis/{location_id}")
 async def get_location_analysis(location_id: str):
     """Get detailed analysis for a specific location"""
-    location = await db.locations.find_one({"id": location_id})
+    location = await db.locations.find_one({"id": location_id}, {"_id": 0})
     
     if not location:
         raise HTTPException(status_code=404, detail="Location not found")
@@ -346,10 +429,35 @@ async def calculate_roi(
         "payback_period_years": break_even_months / 12
     }
 
+@api_router.post("/tariff-simulation")
+@heavy_limiter.limit
+async def simulate_tariff(request: TariffSimulationRequest):
+    """Simulate a year of hourly charging load under a time-of-use tariff"""
+    # Imported on first use to keep numpy out of server startup
+    from simulation import simulate_stations
+    
+    for period in request.tariff.periods:
+        if period.start_hour == period.end_hour:
+            raise HTTPException(status_code=400, detail=f"Tariff period '{period.name}' covers no hours")
+        if period.months and not all(1 <= month <= 12 for month in period.months):
+            raise HTTPException(status_code=400, detail=f"Tariff period '{period.name}' has invalid months")
+    
+    stations = [
+        {**station.dict(), "station_type": station.station_type.value, "location_type": station.location_type.value}
+        for station in request.stations
+    ]
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+            simulate_stations, stations, request.tariff.dict(), request.year
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # Competitor Analysis APIs
 @api_router.post("/competitors", response_model=Competitor)
 async def create_competitor(competitor: Competitor):
     await db.competitors.insert_one(competitor.dict())
+    event_broker.publish_local("insert", {"collection": "competitors", "document": competitor.dict()})
     return competitor
 
 @api_router.get("/competitors", response_model=List[Competitor])
@@ -358,10 +466,14 @@ async def get_competitors():
     return [Competitor(**comp) for comp in competitors]
 
 @api_router.get("/competitor-analysis")
+@single_flight.coalesce
+@heavy_limiter.limit
 async def get_competitor_analysis():
     """Get comprehensive competitor analysis"""
-    competitors = await db.competitors.find().to_list(1000)
-    
+    competitors = await db.competitors.find({}, {"_id": 0}).to_list(1000)
+    return build_competitor_analysis(competitors)
+
+def build_competitor_analysis(competitors: List[Dict[str, Any]]) -> Dict[str, Any]:
     total_market_share = sum(comp.get("market_share_percentage", 0) for comp in competitors)
     avg_price = sum(comp.get("average_price_per_kwh", 0) for comp in competitors) / len(competitors) if competitors else 0
     
@@ -384,6 +496,7 @@ async def get_competitor_analysis():
 @api_router.post("/suppliers", response_model=Supplier)
 async def create_supplier(supplier: Supplier):
     await db.suppliers.insert_one(supplier.dict())
+    event_broker.publish_local("insert", {"collection": "suppliers", "document": supplier.dict()})
     return supplier
 
 @api_router.get("/suppliers", response_model=List[Supplier])
@@ -400,8 +513,10 @@ async def get_china_suppliers():
 @api_router.get("/supplier-analysis")
 async def get_supplier_analysis():
     """Get supplier cost and quality analysis"""
-    suppliers = await db.suppliers.find().to_list(1000)
-    
+    suppliers = await db.suppliers.find({}, {"_id": 0}).to_list(1000)
+    return build_supplier_analysis(suppliers)
+
+def build_supplier_analysis(suppliers: List[Dict[str, Any]]) -> Dict[str, Any]:
     if not suppliers:
         return {"message": "No suppliers found"}
     
@@ -426,6 +541,7 @@ async def get_supplier_analysis():
 @api_router.post("/partnerships", response_model=Partnership)
 async def create_partnership(partnership: Partnership):
     await db.partnerships.insert_one(partnership.dict())
+    event_broker.publish_local("insert", {"collection": "partnerships", "document": partnership.dict()})
     return partnership
 
 @api_router.get("/partnerships", response_model=List[Partnership])
@@ -532,9 +648,85 @@ async def generate_business_plan(
     return business_plan
 
 # Regulatory Compliance APIs
+# Default Karnataka/India requirement used when a state has no regulatory data yet
+DEFAULT_REGULATORY_REQUIREMENT = {
+    "regulation_type": "EV Charging Station License",
+    "description": "License required to operate EV charging stations",
+    "compliance_requirements": [
+        "Technical safety certification",
+        "Electrical contractor license", 
+        "Environmental clearance",
+        "Fire safety certificate"
+    ],
+    "fees_applicable": 25000,
+    "processing_time_days": 45,
+    "required_documents": [
+        "Business registration certificate",
+        "Technical specifications of chargers",
+        "Site layout plans",
+        "Electrical safety certificates"
+    ],
+    "authority": "Karnataka Electricity Regulatory Commission"
+}
+
+COMPLIANCE_CHECKLIST = [
+    "Obtain business registration",
+    "Apply for electrical contractor license",
+    "Get technical safety certifications", 
+    "Submit environmental impact assessment",
+    "Acquire fire safety clearance",
+    "Apply for EV charging station license"
+]
+
+async def refresh_regulatory_summaries(states: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Recompute materialized compliance summaries for the given states.
+
+    Only states with regulatory data are stored and returned; callers fall
+    back to default_regulatory_summary for the rest, so arbitrary state
+    names in requests never add documents to the collection.
+    """
+    pipeline = [
+        {"$match": {"state": {"$in": states}}},
+        {"$group": {
+            "_id": "$state",
+            "total_requirements": {"$sum": 1},
+            "total_fees": {"$sum": "$fees_applicable"},
+            "max_processing_time_days": {"$max": "$processing_time_days"},
+            "regulation_types": {"$addToSet": "$regulation_type"},
+            "authorities": {"$addToSet": "$authority"}
+        }}
+    ]
+    groups = await db.regulatory_info.aggregate(pipeline).to_list(None)
+    
+    summaries = {}
+    for group in groups:
+        state = group.pop("_id")
+        summaries[state] = RegulatoryComplianceSummary(state=state, **group).dict()
+    
+    if summaries:
+        await db.regulatory_summaries.bulk_write(
+            [UpdateOne({"state": state}, {"$set": summary}, upsert=True)
+             for state, summary in summaries.items()],
+            ordered=False
+        )
+    
+    return summaries
+
+def default_regulatory_summary(state: str) -> Dict[str, Any]:
+    return RegulatoryComplianceSummary(
+        state=state,
+        total_requirements=1,
+        total_fees=DEFAULT_REGULATORY_REQUIREMENT["fees_applicable"],
+        max_processing_time_days=DEFAULT_REGULATORY_REQUIREMENT["processing_time_days"],
+        regulation_types=[DEFAULT_REGULATORY_REQUIREMENT["regulation_type"]],
+        authorities=[DEFAULT_REGULATORY_REQUIREMENT["authority"]],
+        is_default=True
+    ).dict()
+
 @api_router.post("/regulatory-info", response_model=RegulatoryInfo)
 async def create_regulatory_info(info: RegulatoryInfo):
     await db.regulatory_info.insert_one(info.dict())
+    await refresh_regulatory_summaries([info.state])
     return info
 
 @api_router.get("/regulatory-info", response_model=List[RegulatoryInfo])
@@ -542,35 +734,41 @@ async def get_regulatory_info():
     info = await db.regulatory_info.find().to_list(1000)
     return [RegulatoryInfo(**item) for item in info]
 
+@api_router.post("/regulatory-compliance/batch")
+async def get_regulatory_compliance_batch(request: RegulatoryComplianceBatchRequest):
+    """Get precomputed compliance summaries for several states in one query"""
+    states = list(dict.fromkeys(request.states))
+    
+    summaries = {
+        summary["state"]: summary
+        for summary in await db.regulatory_summaries.find(
+            {"state": {"$in": states}}, {"_id": 0}
+        ).to_list(None)
+    }
+    
+    # Backfill states whose regulatory data predates the summary collection
+    missing = [state for state in states if state not in summaries]
+    if missing:
+        summaries.update(await refresh_regulatory_summaries(missing))
+    
+    results = [summaries.get(state) or default_regulatory_summary(state) for state in states]
+    
+    return {
+        "states": results,
+        "total_fees": sum(summary["total_fees"] for summary in results),
+        "max_processing_time_days": max(summary["max_processing_time_days"] for summary in results),
+        "states_using_defaults": [summary["state"] for summary in results if summary["is_default"]],
+        "compliance_checklist": COMPLIANCE_CHECKLIST
+    }
+
 @api_router.get("/regulatory-compliance/{state}")
 async def get_regulatory_compliance(state: str):
     """Get regulatory compliance requirements for a specific state"""
-    requirements = await db.regulatory_info.find({"state": state}).to_list(1000)
+    requirements = await db.regulatory_info.find({"state": state}, {"_id": 0}).to_list(1000)
     
     if not requirements:
         # Return default Karnataka/India requirements
-        requirements = [
-            {
-                "regulation_type": "EV Charging Station License",
-                "state": state,
-                "description": "License required to operate EV charging stations",
-                "compliance_requirements": [
-                    "Technical safety certification",
-                    "Electrical contractor license", 
-                    "Environmental clearance",
-                    "Fire safety certificate"
-                ],
-                "fees_applicable": 25000,
-                "processing_time_days": 45,
-                "required_documents": [
-                    "Business registration certificate",
-                    "Technical specifications of chargers",
-                    "Site layout plans",
-                    "Electrical safety certificates"
-                ],
-                "authority": "Karnataka Electricity Regulatory Commission"
-            }
-        ]
+        requirements = [{**DEFAULT_REGULATORY_REQUIREMENT, "state": state}]
     
     total_fees = sum(req.get("fees_applicable", 0) for req in requirements)
     max_processing_time = max(req.get("processing_time_days", 0) for req in requirements)
@@ -581,14 +779,7 @@ async def get_regulatory_compliance(state: str):
         "total_fees": total_fees,
         "max_processing_time_days": max_processing_time,
         "requirements": requirements,
-        "compliance_checklist": [
-            "Obtain business registration",
-            "Apply for electrical contractor license",
-            "Get technical safety certifications", 
-            "Submit environmental impact assessment",
-            "Acquire fire safety clearance",
-            "Apply for EV charging station license"
-        ]
+        "compliance_checklist": COMPLIANCE_CHECKLIST
     }
     
     return compliance_summary
@@ -844,6 +1035,11 @@ async def initialize_sample_data():
         
         await db.regulatory_info.delete_many({})
         await db.regulatory_info.insert_many(regulatory_samples)
+        await db.regulatory_summaries.delete_many({})
+        await refresh_regulatory_summaries(list({info["state"] for info in regulatory_samples}))
+        await heatmap.rebuild_tiles(db)
+        invalidate_site_index()
+        event_broker.publish("resync", {"reason": "sample data initialized"})
         
         return {
             "message": "Sample data initialized successfully",
@@ -862,6 +1058,8 @@ async def initialize_sample_data():
 
 # Dashboard Analytics API
 @api_router.get("/dashboard-analytics")
+@single_flight.coalesce
+@heavy_limiter.limit
 async def get_dashboard_analytics():
     """Get comprehensive analytics for dashboard"""
     
@@ -873,8 +1071,8 @@ async def get_dashboard_analytics():
     partnerships_count = await db.partnerships.count_documents({})
     
     # Get recent data
-    recent_locations = await db.locations.find().sort("created_at", -1).limit(5).to_list(5)
-    recent_partnerships = await db.partnerships.find().sort("created_at", -1).limit(5).to_list(5)
+    recent_locations = await db.locations.find({}, {"_id": 0}).sort("created_at", -1).limit(5).to_list(5)
+    recent_partnerships = await db.partnerships.find({}, {"_id": 0}).sort("created_at", -1).limit(5).to_list(5)
     
     analytics = {
         "overview": {
@@ -904,24 +1102,372 @@ async def get_dashboard_analytics():
     
     return analytics
 
-# Include the router in the main app
-app.include_router(api_router)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+# Composite Batch API
+class CollectionSnapshot:
+    """Reads each collection at most once, shared by all sub-requests of a batch"""
+    
+    def __init__(self, database):
+        self._db = database
+        self._reads: Dict[str, asyncio.Future] = {}
+    
+    async def find(self, collection: str) -> List[Dict[str, Any]]:
+        if collection not in self._reads:
+            self._reads[collection] = asyncio.ensure_future(
+                self._db[collection].find({}, {"_id": 0}).to_list(1000)
+            )
+        return await self._reads[collection]
+
+async def _snapshot_list(snapshot: CollectionSnapshot, collection: str, model):
+    return [model(**item) for item in await snapshot.find(collection)]
+
+async def _competitor_analysis_from(snapshot: CollectionSnapshot):
+    return build_competitor_analysis(await snapshot.find("competitors"))
+
+async def _supplier_analysis_from(snapshot: CollectionSnapshot):
+    return build_supplier_analysis(await snapshot.find("suppliers"))
+
+# Read-only operations available to /api/batch. Full-collection reads go through
+# the shared snapshot; parameterised analyses reuse the regular endpoints.
+BATCH_OPERATIONS = {
+    "market_data": lambda snapshot: _snapshot_list(snapshot, "market_data", MarketData),
+    "market_analysis": lambda snapshot, city: get_market_analysis(city=city),
+    "locations": lambda snapshot: _snapshot_list(snapshot, "locations", LocationAnalysis),
+    "location_analysis": lambda snapshot, location_id: get_location_analysis(location_id=location_id),
+    "financial_models": lambda snapshot: _snapshot_list(snapshot, "financial_models", FinancialModel),
+    "competitors": lambda snapshot: _snapshot_list(snapshot, "competitors", Competitor),
+    "competitor_analysis": lambda snapshot: _competitor_analysis_from(snapshot),
+    "suppliers": lambda snapshot: _snapshot_list(snapshot, "suppliers", Supplier),
+    "supplier_analysis": lambda snapshot: _supplier_analysis_from(snapshot),
+    "partnerships": lambda snapshot: _snapshot_list(snapshot, "partnerships", Partnership),
+    "business_plans": lambda snapshot: _snapshot_list(snapshot, "business_plans", BusinessPlan),
+    "regulatory_info": lambda snapshot: _snapshot_list(snapshot, "regulatory_info", RegulatoryInfo),
+    "regulatory_compliance": lambda snapshot, state: get_regulatory_compliance(state=state),
+    "dashboard_analytics": lambda snapshot: get_dashboard_analytics(),
+}
+
+# Expected type of each parameter; the endpoints normally get these from path validation
+BATCH_PARAM_TYPES = {
+    "market_analysis": {"city": str},
+    "location_analysis": {"location_id": str},
+    "regulatory_compliance": {"state": str},
+}
+
+async def _run_batch_item(snapshot: CollectionSnapshot, item: BatchSubRequest) -> Dict[str, Any]:
+    result = {"id": item.id, "operation": item.operation}
+    operation = BATCH_OPERATIONS.get(item.operation)
+    if operation is None:
+        return {**result, "status": 400, "error": f"Unknown operation '{item.operation}'"}
+    
+    try:
+        inspect.signature(operation).bind(snapshot, **item.params)
+    except TypeError as e:
+        return {**result, "status": 400, "error": f"Invalid params: {e}"}
+    for name, expected in BATCH_PARAM_TYPES.get(item.operation, {}).items():
+        if not isinstance(item.params[name], expected):
+            return {**result, "status": 400, "error": f"Invalid params: '{name}' must be a {expected.__name__}"}
+    
+    try:
+        return {**result, "status": 200, "data": await operation(snapshot, **item.params)}
+    except HTTPException as e:
+        return {**result, "status": e.status_code, "error": e.detail}
+    except Exception:
+        logger.exception("Batch operation %s failed", item.operation)
+        return {**result, "status": 500, "error": "Internal server error"}
+
+@api_router.post("/batch")
+async def run_batch(request: BatchRequest):
+    """Run several read operations concurrently and return all results in one response"""
+    snapshot = CollectionSnapshot(db)
+    results = await asyncio.gather(*[_run_batch_item(snapshot, item) for item in request.requests])
+    return {"results": results}
+
+# Highway Corridor APIs
+# Grid index over location coordinates, created on the first corridor request
+site_index_cache = None
+
+def invalidate_site_index():
+    if site_index_cache is not None:
+        site_index_cache.invalidate()
+
+def add_to_site_index(documents: List[Dict[str, Any]]):
+    if site_index_cache is not None:
+        site_index_cache.add([(document["latitude"], document["longitude"]) for document in documents])
+
+@api_router.post("/corridor-analysis")
+@heavy_limiter.limit
+async def analyze_highway_corridor(request: CorridorAnalysisRequest):
+    """Find stretches of a route without a charger in reach and suggest infill sites"""
+    global site_index_cache
+    # Imported on first use to keep numpy out of server startup
+    from corridor import SiteIndexCache, analyze_corridor
+    
+    for latitude, longitude in request.route:
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise HTTPException(status_code=400, detail="Route points must be [latitude, longitude]")
+    
+    if site_index_cache is None:
+        site_index_cache = SiteIndexCache()
+    index = await site_index_cache.get(db)
+    
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+            analyze_corridor,
+            index,
+            request.route,
+            request.max_range_km,
+            coverage_radius_km=request.coverage_radius_km,
+            sample_spacing_km=request.sample_spacing_km
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Demand Heatmap APIs
+@api_router.get("/heatmap/{z}/{x}/{y}")
+async def get_heatmap_tile(z: int, x: int, y: int, request: Request):
+    """Get a precomputed demand heatmap tile (Web Mercator z/x/y)"""
+    if not heatmap.MIN_ZOOM <= z <= heatmap.MAX_ZOOM:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Zoom must be between {heatmap.MIN_ZOOM} and {heatmap.MAX_ZOOM}"
+        )
+    if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=400, detail="Tile coordinates out of range")
+    
+    tile = await db.heatmap_tiles.find_one({"z": z, "x": x, "y": y}, {"_id": 0})
+    etag = heatmap.etag(z, x, y, tile)
+    headers = {"Cache-Control": "public, max-age=60", "ETag": etag}
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(heatmap.tile_response(z, x, y, tile), headers=headers)
+
+@api_router.post("/heatmap/rebuild")
+async def rebuild_heatmap():
+    """Recompute all heatmap tiles from the locations collection"""
+    tiles = await heatmap.rebuild_tiles(db)
+    return {"message": "Heatmap rebuilt", "tiles": tiles}
+
+# Request Profiling Admin APIs
+def require_profiling_token(token: Optional[str]):
+    if not settings.profiling_token:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not token_matches(token, settings.profiling_token):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+@api_router.get("/admin/profiles")
+async def list_request_profiles(limit: int = 50, x_profile_token: Optional[str] = Header(None)):
+    """List recently stored request profiles, newest first"""
+    require_profiling_token(x_profile_token)
+    return await db.request_profiles.find(
+        {}, {"_id": 0, "session": 0}
+    ).sort("created_at", -1).limit(min(limit, 500)).to_list(None)
+
+@api_router.get("/admin/profiles/{profile_id}")
+async def get_request_profile(
+    profile_id: str,
+    format: str = "speedscope",
+    x_profile_token: Optional[str] = Header(None)
+):
+    """Render a stored profile as a speedscope flame graph, HTML or text"""
+    require_profiling_token(x_profile_token)
+    if format not in RENDER_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format must be one of: {', '.join(RENDER_FORMATS)}")
+    
+    profile = await db.request_profiles.find_one({"id": profile_id}, {"_id": 0})
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    return Response(render_profile(profile, format), media_type=RENDER_FORMATS[format])
+
+# Live Dashboard Events API
+@api_router.get("/events")
+async def stream_events(request: Request):
+    """Server-sent events stream of inserts for live dashboards"""
+    subscription = event_broker.subscribe()
+    return StreamingResponse(
+        event_broker.stream(subscription, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/metrics/events")
+async def get_event_metrics():
+    """Report dashboard event subscribers and delivery counters"""
+    return event_broker.stats()
+
+# Load Metrics API
+@api_router.get("/metrics/load")
+async def get_load_metrics():
+    """Report request coalescing and load shedding counters"""
+    return {
+        "single_flight": single_flight.stats(),
+        "limiter": heavy_limiter.stats()
+    }
+
+@api_router.get("/metrics/write-behind")
+async def get_write_behind_metrics():
+    """Report queued inserts, batch sizes and flush latency"""
+    return write_buffer.stats()
+
+# Bulk Import APIs
+# Each importable collection maps to (row schema, builder producing the stored model)
+IMPORT_TARGETS = {
+    "locations": (LocationAnalysisCreate, lambda row: LocationAnalysis(**row.dict())),
+    "suppliers": (Supplier, lambda row: row),
+}
+
+# Derived data to keep in step with imported documents
+async def _after_location_import(documents: List[Dict[str, Any]]):
+    await heatmap.add_locations(db, documents)
+    add_to_site_index(documents)
+
+IMPORT_HOOKS = {
+    "locations": _after_location_import,
+}
+
+@api_router.post("/import/{collection}")
+async def import_file(collection: str, file: UploadFile = File(...)):
+    """Bulk import site surveys or supplier catalogs from a CSV or Excel file"""
+    if collection not in IMPORT_TARGETS:
+        raise HTTPException(status_code=404, detail=f"Import not supported for '{collection}'")
+    
+    # Imported on first use; openpyxl is slow to import and rarely needed
+    from imports import ImportAborted, iter_rows, import_rows
+    
+    try:
+        rows = iter_rows(file.filename or "", file.file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    schema, build = IMPORT_TARGETS[collection]
+    try:
+        report = await import_rows(
+            db[collection], rows, schema, build, on_inserted=IMPORT_HOOKS.get(collection)
+        )
+    except ImportAborted as e:
+        report = e.report
+        error = str(e)
+    else:
+        error = None
+    if report["inserted"]:
+        event_broker.publish_local("bulk_insert", {"collection": collection, "count": report["inserted"]})
+    if error:
+        raise HTTPException(status_code=400, detail={"error": error, **report})
+    return report
+
+# Analytics Export APIs
+@api_router.post("/exports/{collection}")
+async def export_snapshot(collection: str, partition_by: Optional[str] = None, incremental: bool = True):
+    """Write a Parquet snapshot of a collection for offline analytics"""
+    # Imported on first use; pyarrow is slow to import and rarely needed
+    from exports import export_collection
+    
+    try:
+        return await export_collection(
+            db, collection, settings.export_dir, partition_by=partition_by, incremental=incremental
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def create_indexes():
+    try:
+        await db.regulatory_info.create_index([("state", ASCENDING)])
+        await db.regulatory_summaries.create_index([("state", ASCENDING)], unique=True)
+        await db.heatmap_tiles.create_index(
+            [("z", ASCENDING), ("x", ASCENDING), ("y", ASCENDING)], unique=True
+        )
+        await db.request_profiles.create_index([("id", ASCENDING)], unique=True)
+        await db.request_profiles.create_index(
+            [("created_at", ASCENDING)],
+            expireAfterSeconds=settings.profiling_retention_hours * 3600
+        )
+    except Exception:
+        logger.exception("Failed to create indexes")
+
+def create_app(app_settings: Optional[Settings] = None) -> FastAPI:
+    """Build the application; settings default to the environment and backend/.env"""
+    global settings, client, db
+    
+    settings = app_settings or Settings.from_env()
+    # Sampled profiles could be stored but never viewed, since the admin endpoints need the token
+    if settings.profiling_sample_rate > 0 and not settings.profiling_token:
+        raise ValueError("PROFILING_SAMPLE_RATE requires PROFILING_TOKEN to be set")
+    
+    # Configure logging
+    logging.basicConfig(
+        level=settings.log_level.upper(),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    # MongoDB connection
+    client = AsyncIOMotorClient(settings.mongo_url)
+    db = client[settings.db_name]
+    
+    heavy_limiter.configure(
+        max_concurrent=settings.heavy_max_concurrent,
+        max_queue=settings.heavy_max_queue,
+        retry_after_seconds=settings.heavy_retry_after_seconds
+    )
+    event_broker.configure(
+        max_queue=settings.events_queue_size,
+        heartbeat_seconds=settings.events_heartbeat_seconds
+    )
+    write_buffer.configure(
+        enabled=settings.write_behind_enabled,
+        max_batch_size=settings.write_behind_batch_size,
+        flush_interval_seconds=settings.write_behind_flush_interval_seconds,
+        max_queue=settings.write_behind_max_queue,
+        shutdown_timeout_seconds=settings.write_behind_shutdown_timeout_seconds
+    )
+    write_buffer.on_flush("market_data", _after_market_data_written)
+    write_buffer.on_flush("locations", _after_locations_written)
+    
+    # Create the main app without a prefix
+    app = FastAPI(title="EV Charging Station Business Platform", version="1.0.0")
+    
+    # Include the router in the main app
+    app.include_router(api_router)
+    
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=settings.cors_origins,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    
+    # Only installed when enabled, so unprofiled deployments pay nothing
+    if settings.profiling_token:
+        app.add_middleware(
+            ProfilingMiddleware,
+            store=lambda profile: db.request_profiles.insert_one(profile),
+            token=settings.profiling_token,
+            sample_rate=settings.profiling_sample_rate
+        )
+    
+    @app.on_event("startup")
+    async def start_background_setup():
+        # Index builds can take a while on large collections; don't hold up readiness
+        app.state.index_task = asyncio.get_running_loop().create_task(create_indexes())
+        await write_buffer.start(db)
+        if settings.events_change_streams:
+            app.state.change_stream_task = asyncio.get_running_loop().create_task(
+                event_broker.start_change_stream(client, db)
+            )
+    
+    @app.on_event("shutdown")
+    async def shutdown_db_client():
+        # Queued inserts are written before the connection closes
+        await write_buffer.stop()
+        await event_broker.stop()
+        client.close()
+    
+    return app
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+def __getattr__(name: str):
+    # Keeps `uvicorn server:app` working by building the app on first access
+    if name == "app":
+        app = create_app()
+        globals()["app"] = app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,83 @@
+"""Runtime settings for the API server, read from the environment"""
+import os
+from pathlib import Path
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+ROOT_DIR = Path(__file__).parent
+
+
+class Settings(BaseModel):
+    mongo_url: str
+    db_name: str
+    cors_origins: List[str] = ["*"]
+    export_dir: Path = ROOT_DIR / "exports"
+
+    # Expensive analytics endpoints (see concurrency.py)
+    heavy_max_concurrent: int = 8
+    heavy_max_queue: int = 32
+    heavy_retry_after_seconds: int = 2
+
+    # Dashboard server-sent events (see events.py)
+    events_change_streams: bool = True
+    events_queue_size: int = 100
+    events_heartbeat_seconds: float = 15
+
+    # Per-request profiling (see profiling.py); off unless a token is set, which sampling also needs
+    profiling_token: Optional[str] = None
+    profiling_sample_rate: float = 0.0
+    profiling_retention_hours: int = 72
+
+    # Write-behind batching for location and market data inserts (see write_behind.py)
+    write_behind_enabled: bool = False
+    write_behind_batch_size: int = 500
+    write_behind_flush_interval_seconds: float = 0.5
+    write_behind_max_queue: int = 10000
+    write_behind_shutdown_timeout_seconds: float = 10
+
+    # Process launch (see serve.py)
+    host: str = "0.0.0.0"
+    port: int = 8001
+    workers: int = 1
+    process_manager: str = "uvicorn"
+    loop: str = "uvloop"
+    http: str = "httptools"
+    log_level: str = "info"
+    timeout_keep_alive: int = 5
+
+    @classmethod
+    def from_env(cls, env_file: Path = ROOT_DIR / ".env") -> "Settings":
+        load_dotenv(env_file)
+        env = os.environ
+        return cls(
+            mongo_url=env["MONGO_URL"],
+            db_name=env["DB_NAME"],
+            cors_origins=env.get("CORS_ORIGINS", "*").split(","),
+            export_dir=env.get("EXPORT_DIR", ROOT_DIR / "exports"),
+            heavy_max_concurrent=env.get("HEAVY_MAX_CONCURRENT", 8),
+            heavy_max_queue=env.get("HEAVY_MAX_QUEUE", 32),
+            heavy_retry_after_seconds=env.get("HEAVY_RETRY_AFTER_SECONDS", 2),
+            events_change_streams=env.get("EVENTS_CHANGE_STREAMS", True),
+            events_queue_size=env.get("EVENTS_QUEUE_SIZE", 100),
+            events_heartbeat_seconds=env.get("EVENTS_HEARTBEAT_SECONDS", 15),
+            profiling_token=env.get("PROFILING_TOKEN") or None,
+            profiling_sample_rate=env.get("PROFILING_SAMPLE_RATE", 0.0),
+            profiling_retention_hours=env.get("PROFILING_RETENTION_HOURS", 72),
+            write_behind_enabled=env.get("WRITE_BEHIND_ENABLED", False),
+            write_behind_batch_size=env.get("WRITE_BEHIND_BATCH_SIZE", 500),
+            write_behind_flush_interval_seconds=env.get("WRITE_BEHIND_FLUSH_INTERVAL_SECONDS", 0.5),
+            write_behind_max_queue=env.get("WRITE_BEHIND_MAX_QUEUE", 10000),
+            write_behind_shutdown_timeout_seconds=env.get("WRITE_BEHIND_SHUTDOWN_TIMEOUT_SECONDS", 10),
+            host=env.get("HOST", "0.0.0.0"),
+            port=env.get("PORT", 8001),
+            # WEB_CONCURRENCY is the variable gunicorn and most PaaS platforms already use. The
+            # host CPU count overstates a container's CPU quota, so more workers are opt-in
+            workers=env.get("WEB_CONCURRENCY", 1),
+            process_manager=env.get("PROCESS_MANAGER", "uvicorn"),
+            loop=env.get("SERVER_LOOP", "uvloop"),
+            http=env.get("SERVER_HTTP", "httptools"),
+            log_level=env.get("LOG_LEVEL", "info"),
+            timeout_keep_alive=env.get("TIMEOUT_KEEP_ALIVE", 5),
+        )
@@ -0,0 +1,235 @@
+"""Optional write-behind buffering for high-frequency inserts.
+
+When enabled, validated documents are queued in memory and written with
+``insert_many`` once a collection's queue reaches ``max_batch_size`` or every
+``flush_interval_seconds``, whichever comes first. When the total queue is
+full, or the buffer is disabled, inserts are written synchronously instead.
+
+Queued documents are flushed on graceful shutdown but lost if the process is
+killed, or if MongoDB stays unreachable past the shutdown timeout, so only
+collections that tolerate that (field sync bursts) use it. While MongoDB is
+unreachable, failed batches stay queued and are retried with backoff.
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_BACKOFF_SECONDS = 30.0
+
+FlushHook = Callable[[List[Dict[str, Any]]], Awaitable[Any]]
+
+
+class WriteBehindBuffer:
+    def __init__(self):
+        self.enabled = False
+        self.max_batch_size = 500
+        self.flush_interval_seconds = 0.5
+        self.max_queue = 10000
+        self.shutdown_timeout_seconds = 10.0
+        self._db = None
+        self._queues: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._hooks: Dict[str, FlushHook] = {}
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._metrics = {
+            "enqueued": 0,
+            "sync_writes": 0,
+            "sync_fallbacks": 0,
+            "flushes": 0,
+            "flushed_documents": 0,
+            "failed_documents": 0,
+            "failed_flushes": 0,
+            "abandoned_documents": 0,
+            "max_batch_size_seen": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    def configure(self, enabled: bool, max_batch_size: int, flush_interval_seconds: float, max_queue: int,
+                  shutdown_timeout_seconds: float = 10.0) -> None:
+        self.enabled = enabled
+        self.max_batch_size = max_batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_queue = max_queue
+        self.shutdown_timeout_seconds = shutdown_timeout_seconds
+
+    def on_flush(self, collection: str, hook: FlushHook) -> None:
+        """Run ``hook`` with the documents of ``collection`` once they are written"""
+        self._hooks[collection] = hook
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def start(self, db) -> None:
+        self._db = db
+        if self.enabled:
+            self._flush_lock = asyncio.Lock()
+            self._wakeup = asyncio.Event()
+            self._stopped = asyncio.Event()
+            self._flusher = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background flusher and write whatever is still queued.
+
+        Gives up after ``shutdown_timeout_seconds`` so an unreachable database
+        can't hang shutdown; documents still queued then are logged and counted.
+        """
+        if self._flusher is None:
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.shutdown_timeout_seconds
+
+        # Let the flusher finish its current write and exit; from here on inserts are written directly
+        self._stopped.set()
+        self._wakeup.set()
+        await asyncio.wait({self._flusher}, timeout=self.shutdown_timeout_seconds)
+        if not self._flusher.done():
+            # An interrupted batch is put back on the queue by _write_batch
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+        self._flusher = None
+
+        backoff = self.flush_interval_seconds
+        while self.queued and loop.time() < deadline:
+            try:
+                if await asyncio.wait_for(self.flush(), deadline - loop.time()):
+                    break
+            except asyncio.TimeoutError:
+                break
+            await asyncio.sleep(min(backoff, max(deadline - loop.time(), 0)))
+            backoff = min(backoff * 2, MAX_RETRY_BACKOFF_SECONDS)
+
+        if self.queued:
+            self._metrics["abandoned_documents"] += self.queued
+            logger.error("Write-behind stopped with %d documents not written", self.queued)
+            self._queues.clear()
+
+    async def insert(self, collection: str, document: Dict[str, Any]) -> None:
+        if not self.enabled or self._flusher is None:
+            self._metrics["sync_writes"] += 1
+            await self._write_now(collection, document)
+            return
+        if self.queued >= self.max_queue:
+            # Bounded memory: past the limit, callers pay for their own write
+            self._metrics["sync_fallbacks"] += 1
+            await self._write_now(collection, document)
+            return
+
+        queue = self._queues[collection]
+        queue.append(document)
+        self._metrics["enqueued"] += 1
+        if len(queue) >= self.max_batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> bool:
+        """Write everything queued; returns False if a batch failed and was requeued"""
+        if self._flush_lock is None:
+            return True
+        async with self._flush_lock:
+            for collection in list(self._queues):
+                while self._queues[collection]:
+                    batch = self._queues[collection][:self.max_batch_size]
+                    del self._queues[collection][:len(batch)]
+                    if not await self._write_batch(collection, batch):
+                        # The database is likely unreachable; leave retrying to the caller
+                        return False
+        return True
+
+    async def _run(self) -> None:
+        backoff = 0.0
+        while not self._stopped.is_set():
+            if backoff:
+                # Filling a batch doesn't cut a retry backoff short, only stopping does
+                await _wait(self._stopped, backoff)
+            else:
+                await _wait(self._wakeup, self.flush_interval_seconds)
+            self._wakeup.clear()
+            try:
+                flushed = await self.flush()
+            except Exception:
+                logger.exception("Write-behind flush failed")
+                flushed = False
+            if flushed:
+                backoff = 0.0
+            else:
+                backoff = min(max(backoff * 2, self.flush_interval_seconds), MAX_RETRY_BACKOFF_SECONDS)
+
+    async def _write_now(self, collection: str, document: Dict[str, Any]) -> None:
+        # PyMongo adds _id to what it inserts; hooks get the document as validated
+        await self._db[collection].insert_one(dict(document))
+        await self._run_hook(collection, [document])
+
+    async def _write_batch(self, collection: str, batch: List[Dict[str, Any]]) -> bool:
+        started = time.perf_counter()
+        written = batch
+        try:
+            await self._db[collection].insert_many([dict(document) for document in batch], ordered=False)
+        except asyncio.CancelledError:
+            self._queues[collection][:0] = batch
+            raise
+        except BulkWriteError as e:
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            written = [document for index, document in enumerate(batch) if index not in failed]
+            self._metrics["failed_documents"] += len(failed)
+            logger.error("Write-behind batch for %s had %d failed documents", collection, len(failed))
+        except PyMongoError as e:
+            # Requeue for the next flush while there is room, otherwise give up on the batch
+            room = max(self.max_queue - self.queued, 0)
+            self._queues[collection][:0] = batch[:room]
+            self._metrics["failed_documents"] += max(len(batch) - room, 0)
+            self._metrics["failed_flushes"] += 1
+            logger.warning("Write-behind batch for %s failed (%s), requeued %d documents",
+                           collection, e, min(len(batch), room))
+            return False
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        metrics = self._metrics
+        metrics["flushes"] += 1
+        metrics["flushed_documents"] += len(written)
+        metrics["max_batch_size_seen"] = max(metrics["max_batch_size_seen"], len(batch))
+        metrics["last_flush_ms"] = elapsed_ms
+        metrics["max_flush_ms"] = max(metrics["max_flush_ms"], elapsed_ms)
+        metrics["total_flush_ms"] += elapsed_ms
+        if written:
+            await self._run_hook(collection, written)
+        return True
+
+    async def _run_hook(self, collection: str, documents: List[Dict[str, Any]]) -> None:
+        hook = self._hooks.get(collection)
+        if hook is None:
+            return
+        try:
+            await hook(documents)
+        except Exception:
+            logger.exception("Write-behind hook for %s failed", collection)
+
+    def stats(self) -> Dict[str, Any]:
+        metrics = dict(self._metrics)
+        flushes = metrics["flushes"]
+        return {
+            "enabled": self.enabled,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "max_batch_size": self.max_batch_size,
+            "flush_interval_seconds": self.flush_interval_seconds,
+            **metrics,
+            "average_batch_size": metrics["flushed_documents"] / flushes if flushes else 0,
+            "average_flush_ms": metrics["total_flush_ms"] / flushes if flushes else 0,
+        }
+
+
+async def _wait(event: asyncio.Event, timeout: float) -> None:
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
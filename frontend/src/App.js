@@ -6,6 +6,55 @@ import "./App.css";
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Run several read operations in one round trip via /api/batch.
+// Resolves to an object keyed by operation; failed items are left out.
+const fetchBatch = async (operations) => {
+  const response = await axios.post(`${API}/batch`, {
+    requests: operations.map((operation) => ({ id: operation, operation })),
+  });
+  return response.data.results.reduce((results, item) => {
+    if (item.status === 200) {
+      results[item.id] = item.data;
+    } else {
+      console.error(`Batch operation ${item.operation} failed:`, item.error);
+    }
+    return results;
+  }, {});
+};
+
+// Dashboard overview counter and recent-activity list affected by each collection
+const DASHBOARD_COUNTERS = {
+  market_data: "market_research_entries",
+  locations: "analyzed_locations",
+  competitors: "tracked_competitors",
+  suppliers: "supplier_database",
+  partnerships: "active_partnerships",
+};
+const DASHBOARD_RECENT = {
+  locations: "latest_locations",
+  partnerships: "latest_partnerships",
+};
+
+const applyDashboardInsert = (analytics, { collection, document }) => {
+  if (!analytics) {
+    return analytics;
+  }
+  const counter = DASHBOARD_COUNTERS[collection];
+  const recent = DASHBOARD_RECENT[collection];
+  return {
+    ...analytics,
+    overview: counter
+      ? { ...analytics.overview, [counter]: analytics.overview[counter] + 1 }
+      : analytics.overview,
+    recent_activity: recent
+      ? {
+          ...analytics.recent_activity,
+          [recent]: [document, ...analytics.recent_activity[recent]].slice(0, 5),
+        }
+      : analytics.recent_activity,
+  };
+};
+
 // Dashboard Component
 const Dashboard = () => {
   const [analytics, setAnalytics] = useState(null);
@@ -13,6 +62,16 @@ const Dashboard = () => {
 
   useEffect(() => {
     fetchDashboardAnalytics();
+
+    // Apply pushed inserts instead of polling; refetch when the server asks to resync
+    const events = new EventSource(`${API}/events`);
+    events.addEventListener("insert", (event) => {
+      const change = JSON.parse(event.data);
+      setAnalytics((current) => applyDashboardInsert(current, change));
+    });
+    events.addEventListener("bulk_insert", () => fetchDashboardAnalytics());
+    events.addEventListener("resync", () => fetchDashboardAnalytics());
+    return () => events.close();
   }, []);
 
   const fetchDashboardAnalytics = async () => {
@@ -605,25 +664,16 @@ const CompetitorAnalysis = () => {
   const [analysis, setAnalysis] = useState(null);
 
   useEffect(() => {
-    fetchCompetitors();
-    fetchCompetitorAnalysis();
+    fetchCompetitorData();
   }, []);
 
-  const fetchCompetitors = async () => {
+  const fetchCompetitorData = async () => {
     try {
-      const response = await axios.get(`${API}/competitors`);
-      setCompetitors(response.data);
+      const results = await fetchBatch(["competitors", "competitor_analysis"]);
+      setCompetitors(results.competitors || []);
+      setAnalysis(results.competitor_analysis || null);
     } catch (error) {
-      console.error("Error fetching competitors:", error);
-    }
-  };
-
-  const fetchCompetitorAnalysis = async () => {
-    try {
-      const response = await axios.get(`${API}/competitor-analysis`);
-      setAnalysis(response.data);
-    } catch (error) {
-      console.error("Error fetching competitor analysis:", error);
+      console.error("Error fetching competitor data:", error);
     }
   };
 
@@ -726,25 +776,16 @@ const SupplierManagement = () => {
   const [analysis, setAnalysis] = useState(null);
 
   useEffect(() => {
-    fetchSuppliers();
-    fetchSupplierAnalysis();
+    fetchSupplierData();
   }, []);
 
-  const fetchSuppliers = async () => {
+  const fetchSupplierData = async () => {
     try {
-      const response = await axios.get(`${API}/suppliers`);
-      setSuppliers(response.data);
-    } catch (error) {
-      console.error("Error fetching suppliers:", error);
-    }
-  };
-
-  const fetchSupplierAnalysis = async () => {
-    try {
-      const response = await axios.get(`${API}/supplier-analysis`);
-      setAnalysis(response.data);
+      const results = await fetchBatch(["suppliers", "supplier_analysis"]);
+      setSuppliers(results.suppliers || []);
+      setAnalysis(results.supplier_analysis || null);
     } catch (error) {
-      console.error("Error fetching supplier analysis:", error);
+      console.error("Error fetching supplier data:", error);
     }
   };
 
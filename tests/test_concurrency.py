@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from concurrency import ConcurrencyLimiter, SingleFlight
+
+
+def test_single_flight_coalesces_identical_concurrent_calls():
+    flight = SingleFlight()
+    calls = []
+
+    @flight.coalesce
+    async def analysis(city):
+        calls.append(city)
+        await asyncio.sleep(0.02)
+        return {"city": city}
+
+    async def run():
+        return await asyncio.gather(
+            analysis(city="Pune"), analysis(city="Pune"), analysis(city="Delhi")
+        )
+
+    results = asyncio.run(run())
+    assert results == [{"city": "Pune"}, {"city": "Pune"}, {"city": "Delhi"}]
+    assert sorted(calls) == ["Delhi", "Pune"]
+    assert flight.stats() == {"executed": 2, "coalesced": 1, "in_flight": 0}
+
+
+def test_single_flight_does_not_cache_finished_calls():
+    flight = SingleFlight()
+    calls = []
+
+    @flight.coalesce
+    async def analysis():
+        calls.append(1)
+
+    async def run():
+        await analysis()
+        await analysis()
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_limiter_sheds_load_past_the_queue_with_503():
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=1, retry_after_seconds=7)
+    async def run():
+        gate = asyncio.Event()
+
+        @limiter.limit
+        async def slow():
+            await gate.wait()
+            return "done"
+
+        running = asyncio.ensure_future(slow())
+        queued = asyncio.ensure_future(slow())
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as shed:
+            await slow()
+        stats = limiter.stats()
+        gate.set()
+        return shed.value, stats, await asyncio.gather(running, queued), limiter.stats()
+
+    error, busy_stats, results, final_stats = asyncio.run(run())
+    assert error.status_code == 503
+    assert error.headers == {"Retry-After": "7"}
+    assert busy_stats["active"] == 1
+    assert busy_stats["queued"] == 1
+    assert results == ["done", "done"]
+    assert final_stats["admitted"] == 2
+    assert final_stats["shed"] == 1
@@ -0,0 +1,113 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from corridor import SiteIndex, SiteIndexCache, analyze_corridor, densify_route, haversine_km
+
+
+def brute_force_nearest(sites, latitudes, longitudes, radius_km):
+    distances = haversine_km(
+        latitudes[:, None], longitudes[:, None], sites[None, :, 0], sites[None, :, 1]
+    ).min(axis=1)
+    return np.where(distances <= radius_km, distances, np.inf)
+
+
+@pytest.mark.parametrize("radius_km", [5.0, 40.0, 250.0])
+def test_nearest_within_matches_brute_force(radius_km):
+    rng = np.random.default_rng(7)
+    # A dense cluster plus sparse sites, at a latitude where longitude cells are narrow
+    sites = np.vstack([
+        rng.normal([52.0, 5.0], 0.05, size=(500, 2)),
+        rng.uniform([45.0, -5.0], [60.0, 15.0], size=(300, 2)),
+    ])
+    points = rng.uniform([44.0, -6.0], [61.0, 16.0], size=(400, 2))
+    index = SiteIndex(sites[:, 0], sites[:, 1])
+
+    found = index.nearest_within(points[:, 0], points[:, 1], radius_km)
+    expected = brute_force_nearest(sites, points[:, 0], points[:, 1], radius_km)
+
+    assert np.array_equal(np.isinf(found), np.isinf(expected))
+    finite = np.isfinite(expected)
+    assert np.allclose(found[finite], expected[finite])
+
+
+def test_nearest_within_empty_index():
+    index = SiteIndex(np.empty(0), np.empty(0))
+    assert np.isinf(index.nearest_within(np.array([10.0]), np.array([10.0]), 50)).all()
+
+
+def test_densify_route_spacing_and_length():
+    latitudes, longitudes, along = densify_route([(0.0, 0.0), (0.0, 1.0)], 1.0)
+    assert along[-1] == pytest.approx(haversine_km(0.0, 0.0, 0.0, 1.0))
+    assert np.allclose(np.diff(along)[:-1], 1.0)
+    assert latitudes[0] == 0.0 and longitudes[-1] == pytest.approx(1.0)
+
+
+def test_analyze_corridor_reports_gap_between_chargers():
+    # Chargers at both ends of a ~333 km route, 100 km coverage radius
+    index = SiteIndex(np.array([0.0, 0.0]), np.array([0.0, 3.0]))
+    result = analyze_corridor(index, [(0.0, 0.0), (0.0, 3.0)], max_range_km=200)
+
+    assert len(result["gaps"]) == 1
+    gap = result["gaps"][0]
+    assert gap["start_km"] == pytest.approx(100, abs=1)
+    assert gap["end_km"] == pytest.approx(result["route_length_km"] - 100, abs=1)
+    assert len(result["suggested_infill"]) == 1
+    assert result["max_distance_to_charger_km"] is None
+
+
+class CountingDatabase:
+    """Stands in for the locations collection and counts full reloads"""
+
+    def __init__(self, sites):
+        self.sites = sites
+        self.loads = 0
+        self.locations = self
+
+    def find(self, query, projection):
+        return self
+
+    async def to_list(self, length):
+        self.loads += 1
+        return [{"latitude": latitude, "longitude": longitude} for latitude, longitude in self.sites]
+
+
+def test_site_index_cache_merges_added_sites_without_reloading():
+    db = CountingDatabase([(0.0, 0.0)])
+    cache = SiteIndexCache()
+
+    async def scenario():
+        first = await cache.get(db)
+        cache.add([(0.0, 3.0)])
+        cache.add([(1.0, 1.0), (2.0, 2.0)])
+        second = await cache.get(db)
+        third = await cache.get(db)
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    assert db.loads == 1
+    assert first.size == 1
+    assert second.size == 4 and third is second
+    assert second.nearest_within(np.array([0.0]), np.array([3.0]), 1.0)[0] == pytest.approx(0.0)
+
+
+def test_site_index_cache_reloads_after_invalidate_or_max_age():
+    db = CountingDatabase([(0.0, 0.0)])
+    cache = SiteIndexCache(max_age_seconds=0)
+
+    async def scenario():
+        await cache.get(db)
+        cache.add([(0.0, 3.0)])
+        # Past max_age the reload replaces the queued sites rather than adding them twice
+        expired = await cache.get(db)
+        cache.max_age_seconds = 300
+        cache.invalidate()
+        cache.add([(5.0, 5.0)])
+        invalidated = await cache.get(db)
+        return expired, invalidated
+
+    expired, invalidated = asyncio.run(scenario())
+    assert db.loads == 3
+    assert expired.size == 1
+    assert invalidated.size == 1
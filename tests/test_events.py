@@ -0,0 +1,114 @@
+import asyncio
+from datetime import datetime
+
+from events import EventBroker, Subscription
+
+
+def test_overflow_replaces_backlog_with_resync():
+    async def scenario():
+        subscription = Subscription(max_queue=3)
+        accepted = [subscription.offer({"type": "insert", "data": {"n": n}}) for n in range(4)]
+        events = []
+        while not subscription.queue.empty():
+            events.append(subscription.queue.get_nowait())
+        return subscription, accepted, events
+
+    subscription, accepted, events = asyncio.run(scenario())
+    assert accepted == [True, True, True, False]
+    assert [event["type"] for event in events] == ["resync"]
+    assert subscription.overflowed == 1
+
+
+def test_publish_counts_drops_and_keeps_other_subscribers():
+    async def scenario():
+        broker = EventBroker(max_queue=2)
+        slow = broker.subscribe()
+        fast = broker.subscribe()
+        for n in range(3):
+            broker.publish("insert", {"n": n, "at": datetime(2024, 1, 1)})
+            if not fast.queue.empty():
+                fast.queue.get_nowait()
+        return broker, slow, fast
+
+    broker, slow, fast = asyncio.run(scenario())
+    assert broker.published == 3
+    assert broker.dropped == 1
+    assert slow.queue.get_nowait()["type"] == "resync"
+    assert fast.queue.empty()
+
+
+def test_stream_unsubscribes_when_the_client_disconnects():
+    async def scenario():
+        broker = EventBroker(heartbeat_seconds=0.01)
+        subscription = broker.subscribe()
+        broker.publish("insert", {"collection": "locations"})
+        checks = iter([False, False, True])
+
+        async def is_disconnected():
+            return next(checks)
+
+        frames = [frame async for frame in broker.stream(subscription, is_disconnected)]
+        return broker, frames
+
+    broker, frames = asyncio.run(scenario())
+    assert frames[0].startswith("event: ready")
+    assert frames[1] == 'event: insert\ndata: {"collection": "locations"}\n\n'
+    assert frames[2] == ": keep-alive\n\n"
+    assert len(frames) == 3
+    assert broker.stats()["subscribers"] == 0
+
+
+def test_stream_unsubscribes_when_the_response_is_cancelled():
+    async def scenario():
+        broker = EventBroker()
+        subscription = broker.subscribe()
+
+        async def is_disconnected():
+            return False
+
+        stream = broker.stream(subscription, is_disconnected)
+        await stream.__anext__()
+        # Starlette closes the generator when the connection drops mid-wait
+        await stream.aclose()
+        return broker
+
+    assert asyncio.run(scenario()).stats()["subscribers"] == 0
+
+
+def test_publish_local_is_skipped_when_the_change_stream_reports_writes():
+    async def scenario():
+        broker = EventBroker()
+        subscription = broker.subscribe()
+        broker.publish_local("insert", {"n": 1})
+        broker.source = "change_stream"
+        broker.publish_local("insert", {"n": 2})
+        return broker, subscription
+
+    broker, subscription = asyncio.run(scenario())
+    assert broker.published == 1
+    assert subscription.queue.get_nowait()["data"] == {"n": 1}
+    assert subscription.queue.empty()
+
+
+class FakeAdmin:
+    def __init__(self, hello):
+        self.hello = hello
+
+    async def command(self, name):
+        return self.hello
+
+
+class FakeClient:
+    def __init__(self, hello):
+        self.admin = FakeAdmin(hello)
+
+
+def test_standalone_server_keeps_local_events():
+    async def scenario():
+        broker = EventBroker()
+        await broker.start_change_stream(FakeClient({"isWritablePrimary": True}), db=None)
+        return broker
+
+    broker = asyncio.run(scenario())
+    assert broker.source == "local"
+    assert broker._watch_task is None
@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pyarrow.dataset as ds
+import pytest
+
+from exports import export_collection
+
+START = datetime(2025, 1, 1)
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, key, direction):
+        self.documents = sorted(self.documents, key=lambda document: document[key])
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield dict(document)
+
+
+class FakeCollection:
+    def __init__(self):
+        self.documents = []
+
+    def find(self, query, projection=None):
+        bound = query.get("created_at", {}).get("$gt")
+        return FakeCursor([
+            document for document in self.documents if bound is None or document["created_at"] > bound
+        ])
+
+
+def market_row(index, created_at):
+    return {
+        "id": f"m{index}", "region": "South", "city": f"City {index % 2}", "ev_adoption_rate": 2.5,
+        "current_charging_stations": 10, "population": 100000, "average_income": 500000.0,
+        "market_size_millions": 10.0, "growth_rate_percentage": 30.0, "competition_level": "Low",
+        "created_at": created_at,
+    }
+
+
+def export(db, tmp_path, **kwargs):
+    return asyncio.run(export_collection(db, "market_data", tmp_path, **kwargs))
+
+
+def dataset_ids(tmp_path, partitioned=False):
+    dataset = ds.dataset(tmp_path / "market_data", format="parquet", partitioning="hive" if partitioned else None)
+    return sorted(dataset.to_table(columns=["id"]).column("id").to_pylist())
+
+
+def test_incremental_runs_append_only_new_rows(tmp_path):
+    db = {"market_data": FakeCollection()}
+    db["market_data"].documents = [market_row(i, START + timedelta(minutes=i)) for i in range(3)]
+    assert export(db, tmp_path)["rows_exported"] == 3
+
+    db["market_data"].documents.append(market_row(3, START + timedelta(minutes=3)))
+    assert export(db, tmp_path)["rows_exported"] == 1
+    assert dataset_ids(tmp_path) == ["m0", "m1", "m2", "m3"]
+
+
+def test_full_export_replaces_incremental_files(tmp_path):
+    db = {"market_data": FakeCollection()}
+    db["market_data"].documents = [market_row(i, START + timedelta(minutes=i)) for i in range(3)]
+    export(db, tmp_path)
+    result = export(db, tmp_path, incremental=False)
+
+    assert result["rows_exported"] == 3
+    assert dataset_ids(tmp_path) == ["m0", "m1", "m2"]
+    assert all(path.startswith(str(tmp_path / "market_data")) for path in result["files"])
+    assert [path.name for path in tmp_path.iterdir()] == ["market_data"]
+
+    # The full export's watermark carries over to later incremental runs
+    assert export(db, tmp_path)["rows_exported"] == 0
+
+
+def test_incremental_run_rejects_different_partitioning(tmp_path):
+    db = {"market_data": FakeCollection()}
+    db["market_data"].documents = [market_row(i, START + timedelta(minutes=i)) for i in range(3)]
+    export(db, tmp_path)
+
+    with pytest.raises(ValueError, match="partitioned"):
+        export(db, tmp_path, partition_by="city")
+
+    export(db, tmp_path, partition_by="city", incremental=False)
+    assert dataset_ids(tmp_path, partitioned=True) == ["m0", "m1", "m2"]
+
+
+def test_row_stored_late_is_exported_once_by_next_run(tmp_path):
+    db = {"market_data": FakeCollection()}
+    db["market_data"].documents = [market_row(i, START + timedelta(minutes=i)) for i in range(3)]
+    export(db, tmp_path)
+
+    # Created before the watermark but only written after the previous export ran
+    db["market_data"].documents.append(market_row(3, START + timedelta(minutes=1, seconds=30)))
+    assert export(db, tmp_path)["rows_exported"] == 1
+    assert export(db, tmp_path)["rows_exported"] == 0
+    assert dataset_ids(tmp_path) == ["m0", "m1", "m2", "m3"]
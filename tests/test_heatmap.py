@@ -0,0 +1,100 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from mongomock_motor import AsyncMongoMockClient
+
+import heatmap
+from heatmap import CELLS_PER_SIDE, MAX_ZOOM, MIN_ZOOM, tile_cell
+
+
+def test_tile_cell_matches_web_mercator():
+    assert tile_cell(0.0, 0.0, 0) == (0, 0, CELLS_PER_SIDE // 2, CELLS_PER_SIDE // 2)
+    # Chennai at z=10 lies in tile 740/474
+    x, y, _, _ = tile_cell(13.0827, 80.2707, 10)
+    assert (x, y) == (740, 474)
+
+
+def test_tile_cell_clamps_to_the_map_edges():
+    scale = 2 ** 5
+    assert tile_cell(90.0, 180.0, 5)[:2] == (scale - 1, 0)
+    assert tile_cell(-90.0, -180.0, 5)[:2] == (0, scale - 1)
+    for cell in tile_cell(-90.0, 180.0, 5)[2:]:
+        assert 0 <= cell < CELLS_PER_SIDE
+
+
+def test_location_updates_sum_locations_in_the_same_cell():
+    locations = [
+        {"latitude": 13.0, "longitude": 80.0, "daily_traffic": 100},
+        {"latitude": 13.0, "longitude": 80.0, "daily_traffic": 50},
+    ]
+    updates = heatmap.location_updates(locations)
+    assert len(updates) == MAX_ZOOM - MIN_ZOOM + 1
+    document = updates[0]._doc
+    increments = document["$inc"]
+    counts = [value for key, value in increments.items() if key.endswith(".count")]
+    traffic = [value for key, value in increments.items() if key.endswith(".daily_traffic")]
+    assert counts == [2] and traffic == [150]
+    assert increments["version"] == 1
+    assert "epoch" in document["$setOnInsert"]
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_incremental_updates_match_a_rebuild():
+    async def scenario():
+        db = AsyncMongoMockClient()["heatmap"]
+        locations = [
+            {"latitude": 13.08, "longitude": 80.27, "daily_traffic": 100, "revenue_potential": 5.0},
+            {"latitude": 12.97, "longitude": 77.59, "daily_traffic": 40, "revenue_potential": 2.0},
+        ]
+        await db.locations.insert_many([dict(location) for location in locations])
+        await heatmap.add_locations(db, locations)
+        incremental = await db.heatmap_tiles.find({}, {"_id": 0, "z": 1, "x": 1, "y": 1, "cells": 1}).to_list(None)
+        await heatmap.rebuild_tiles(db)
+        rebuilt = await db.heatmap_tiles.find({}, {"_id": 0, "z": 1, "x": 1, "y": 1, "cells": 1}).to_list(None)
+        return incremental, rebuilt
+
+    incremental, rebuilt = run(scenario())
+    key = lambda tile: (tile["z"], tile["x"], tile["y"])
+    assert sorted(incremental, key=key) == sorted(rebuilt, key=key)
+
+
+def test_rebuild_drops_stale_tiles_and_keeps_concurrent_updates():
+    async def scenario():
+        db = AsyncMongoMockClient()["heatmap"]
+        await db.locations.insert_one({"latitude": 13.08, "longitude": 80.27})
+        now = datetime.utcnow()
+        # Left over from a deleted location, and written by add_locations while the rebuild ran
+        await db.heatmap_tiles.insert_one({"z": 14, "x": 1, "y": 1, "version": 3, "updated_at": now - timedelta(days=1)})
+        await db.heatmap_tiles.insert_one({"z": 14, "x": 2, "y": 2, "version": 1, "updated_at": now + timedelta(seconds=5)})
+        written = await heatmap.rebuild_tiles(db)
+        stale = await db.heatmap_tiles.count_documents({"x": 1, "y": 1, "z": 14})
+        concurrent = await db.heatmap_tiles.count_documents({"x": 2, "y": 2, "z": 14})
+        total = await db.heatmap_tiles.count_documents({})
+        return written, stale, concurrent, total
+
+    written, stale, concurrent, total = run(scenario())
+    assert written == MAX_ZOOM - MIN_ZOOM + 1
+    assert stale == 0
+    assert concurrent == 1
+    assert total == written + 1
+
+
+def test_recreated_tile_gets_a_new_etag():
+    async def scenario():
+        db = AsyncMongoMockClient()["heatmap"]
+        location = {"latitude": 13.08, "longitude": 80.27}
+        x, y, _, _ = tile_cell(13.08, 80.27, MAX_ZOOM)
+        query = {"z": MAX_ZOOM, "x": x, "y": y}
+        await heatmap.add_locations(db, [location])
+        first = heatmap.etag(MAX_ZOOM, x, y, await db.heatmap_tiles.find_one(query))
+        await db.heatmap_tiles.delete_many({})
+        await asyncio.sleep(0.002)
+        await heatmap.add_locations(db, [location, location])
+        second = heatmap.etag(MAX_ZOOM, x, y, await db.heatmap_tiles.find_one(query))
+        return first, second
+
+    first, second = run(scenario())
+    assert first != second
@@ -0,0 +1,68 @@
+import io
+import zipfile
+from typing import List, Optional
+
+import pytest
+
+from imports import iter_csv_rows, iter_excel_rows, read_chunk
+
+
+def test_read_chunk_stops_at_undecodable_row():
+    data = "name,city\nA,Paris\n".encode() + "Café,Lyon\n".encode("cp1252")
+    chunk, error = read_chunk(iter_csv_rows(io.BytesIO(data)), 10)
+    assert chunk == [{"name": "A", "city": "Paris"}]
+    assert "UTF-8" in error
+
+
+def test_read_chunk_reads_utf8_with_bom():
+    data = "﻿name,city\nCafé,Lyon\n".encode()
+    chunk, error = read_chunk(iter_csv_rows(io.BytesIO(data)), 10)
+    assert chunk == [{"name": "Café", "city": "Lyon"}]
+    assert error is None
+
+
+def _zip_without_workbook():
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as archive:
+        archive.writestr("notes.txt", "not a workbook")
+    return data.getvalue()
+
+
+@pytest.mark.parametrize("data", [b"not a zip file", _zip_without_workbook()])
+def test_read_chunk_reports_invalid_workbook(data):
+    chunk, error = read_chunk(iter_excel_rows(io.BytesIO(data)), 10)
+    assert chunk == []
+    assert ".xlsx" in error
+
+
+def test_excel_numbers_in_text_fields_are_imported_as_text():
+    from openpyxl import Workbook
+    from pydantic import BaseModel
+
+    from imports import normalize_row
+
+    class Supplier(BaseModel):
+        company_name: str
+        phone: str
+        min_order_quantity: int
+        notes: Optional[str] = None
+        product_types: List[str]
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["company_name", "phone", "min_order_quantity", "notes", "product_types"])
+    sheet.append(["Volt Parts", 9876543210, 50, 12.5, 7])
+    sheet.append(["Amp Co", 9876543211.0, 10, None, "Chargers; Cables"])
+    data = io.BytesIO()
+    workbook.save(data)
+    data.seek(0)
+
+    chunk, error = read_chunk(iter_excel_rows(data), 10)
+    suppliers = [Supplier(**normalize_row(row, Supplier)) for row in chunk]
+
+    assert error is None
+    assert [supplier.phone for supplier in suppliers] == ["9876543210", "9876543211"]
+    assert suppliers[0].notes == "12.5"
+    assert suppliers[0].product_types == ["7"]
+    assert suppliers[1].product_types == ["Chargers", "Cables"]
+    assert suppliers[1].min_order_quantity == 10
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+import profiling
+from profiling import PROFILE_HEADER, ProfilingMiddleware
+
+TOKEN = "s3cret-token"
+
+
+def http_scope(path="/api/locations", headers=()):
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": b"",
+        "headers": [(name.encode(), value.encode()) for name, value in headers],
+    }
+
+
+def make_middleware(app=None, token=TOKEN, sample_rate=0.0, stored=None):
+    async def store(profile):
+        stored.append(profile)
+
+    async def ok(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    return ProfilingMiddleware(app or ok, store, token=token, sample_rate=sample_rate)
+
+
+def test_matching_header_triggers_a_profile():
+    middleware = make_middleware()
+    assert middleware._trigger(http_scope(headers=[(PROFILE_HEADER, TOKEN)])) == "header"
+
+
+@pytest.mark.parametrize("headers", [[], [(PROFILE_HEADER, "wrong")], [(PROFILE_HEADER, "")], [("x-other", TOKEN)]])
+def test_missing_or_wrong_header_does_not_trigger(headers):
+    assert make_middleware()._trigger(http_scope(headers=headers)) is None
+
+
+def test_sample_rate_triggers_by_random_draw(monkeypatch):
+    middleware = make_middleware(sample_rate=0.25)
+    monkeypatch.setattr(profiling.random, "random", lambda: 0.2)
+    assert middleware._trigger(http_scope()) == "sampled"
+    monkeypatch.setattr(profiling.random, "random", lambda: 0.3)
+    assert middleware._trigger(http_scope()) is None
+
+
+@pytest.mark.parametrize("path", ["/api/events", "/api/events/stream", "/api/admin/profiles", "/api/admin/profiles/abc"])
+def test_excluded_paths_are_never_profiled(monkeypatch, path):
+    middleware = make_middleware(sample_rate=1.0)
+    monkeypatch.setattr(profiling.random, "random", lambda: 0.0)
+    assert middleware._trigger(http_scope(path, headers=[(PROFILE_HEADER, TOKEN)])) is None
+
+
+def test_non_http_scopes_are_never_profiled():
+    middleware = make_middleware(sample_rate=1.0)
+    assert middleware._trigger({"type": "lifespan"}) is None
+    assert middleware._trigger({"type": "websocket", "path": "/api/locations", "headers": []}) is None
+
+
+def test_profiled_request_is_stored_after_the_response():
+    stored = []
+    sent = []
+    middleware = make_middleware(stored=stored)
+
+    async def scenario():
+        async def send(message):
+            sent.append(message)
+
+        await middleware(http_scope(headers=[(PROFILE_HEADER, TOKEN)]), None, send)
+        await asyncio.gather(*middleware._pending)
+
+    asyncio.run(scenario())
+    assert [message["type"] for message in sent] == ["http.response.start", "http.response.body"]
+    assert len(stored) == 1
+    profile = stored[0]
+    assert profile["trigger"] == "header"
+    assert profile["status_code"] == 200
+    assert profile["path"] == "/api/locations"
+
+
+def test_unprofiled_request_passes_straight_through():
+    stored = []
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+
+    middleware = make_middleware(app=app, stored=stored)
+    asyncio.run(middleware(http_scope(), None, None))
+    assert calls == ["/api/locations"]
+    assert stored == []
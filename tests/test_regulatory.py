@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from server import RegulatoryComplianceBatchRequest
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = AsyncMongoMockClient()["regulatory"]
+    monkeypatch.setattr(server, "db", database)
+    return database
+
+
+def requirement(state, fees, days, authority="State Commission"):
+    return {
+        "state": state,
+        "regulation_type": "EV Charging Station License",
+        "description": "License",
+        "compliance_requirements": [],
+        "fees_applicable": fees,
+        "processing_time_days": days,
+        "required_documents": [],
+        "authority": authority,
+    }
+
+
+def test_refresh_stores_only_states_with_data(db):
+    async def scenario():
+        await db.regulatory_info.insert_many([
+            requirement("Karnataka", 25000, 45),
+            requirement("Karnataka", 5000, 60, authority="Fire Department"),
+        ])
+        summaries = await server.refresh_regulatory_summaries(["Karnataka", "Atlantis"])
+        stored = await db.regulatory_summaries.find({}, {"_id": 0}).to_list(None)
+        return summaries, stored
+
+    summaries, stored = asyncio.run(scenario())
+    assert list(summaries) == ["Karnataka"]
+    assert [summary["state"] for summary in stored] == ["Karnataka"]
+    karnataka = stored[0]
+    assert karnataka["total_requirements"] == 2
+    assert karnataka["total_fees"] == 30000
+    assert karnataka["max_processing_time_days"] == 60
+    assert sorted(karnataka["authorities"]) == ["Fire Department", "State Commission"]
+    assert not karnataka["is_default"]
+
+
+def test_refresh_replaces_an_outdated_summary(db):
+    async def scenario():
+        await db.regulatory_info.insert_one(requirement("Kerala", 10000, 30))
+        await server.refresh_regulatory_summaries(["Kerala"])
+        await db.regulatory_info.insert_one(requirement("Kerala", 2000, 90))
+        await server.refresh_regulatory_summaries(["Kerala"])
+        return await db.regulatory_summaries.find({}, {"_id": 0}).to_list(None)
+
+    stored = asyncio.run(scenario())
+    assert len(stored) == 1
+    assert stored[0]["total_fees"] == 12000
+    assert stored[0]["max_processing_time_days"] == 90
+
+
+def test_batch_backfills_real_states_and_defaults_the_rest(db):
+    async def scenario():
+        # Regulatory data inserted before the summary collection existed
+        await db.regulatory_info.insert_one(requirement("Goa", 15000, 20))
+        request = RegulatoryComplianceBatchRequest(states=["Goa", "Atlantis", "Goa"])
+        response = await server.get_regulatory_compliance_batch(request)
+        stored = await db.regulatory_summaries.distinct("state")
+        return response, stored
+
+    response, stored = asyncio.run(scenario())
+    assert [summary["state"] for summary in response["states"]] == ["Goa", "Atlantis"]
+    assert response["states_using_defaults"] == ["Atlantis"]
+    default_fees = server.DEFAULT_REGULATORY_REQUIREMENT["fees_applicable"]
+    assert response["total_fees"] == 15000 + default_fees
+    assert response["max_processing_time_days"] == server.DEFAULT_REGULATORY_REQUIREMENT["processing_time_days"]
+    assert response["compliance_checklist"] == server.COMPLIANCE_CHECKLIST
+    assert stored == ["Goa"]
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from simulation import HOURS_PER_YEAR, erlang_b, occupancy, simulate_stations
+
+TARIFF = {
+    "base_price_per_kwh": 0.12,
+    "demand_charge_per_kw": 10.0,
+    "periods": [{"name": "peak", "price_per_kwh": 0.30, "start_hour": 17, "end_hour": 21}],
+}
+
+
+def station(**overrides):
+    return {
+        "name": "S",
+        "station_type": "DC Fast Charging",
+        "location_type": "Highway",
+        "connectors": 4,
+        "daily_sessions": 40,
+        "average_session_kwh": 30,
+        "charging_price_per_kwh": 0.45,
+        "fixed_costs_monthly": 0,
+        **overrides,
+    }
+
+
+def test_erlang_b_matches_known_values():
+    load = np.array([[1.0, 2.0], [5.0, 0.0]])
+    blocking = erlang_b(load, np.array([1, 3]))
+    # B(A, 1) = A / (1 + A); B(5, 3) = 125/6 / (1 + 5 + 12.5 + 125/6)
+    assert blocking[0] == pytest.approx([0.5, 2 / 3])
+    assert blocking[1, 0] == pytest.approx((125 / 6) / (1 + 5 + 12.5 + 125 / 6))
+    assert blocking[1, 1] == 0.0
+
+
+def test_occupancy_spreads_sessions_over_their_duration():
+    arrivals = np.zeros((1, 24))
+    arrivals[0, 23] = 2.0
+    busy = occupancy(arrivals, np.array([2.5]))
+    # Wraps into the start of the year: 1 + 1 + 0.5 connector-hours per session
+    assert busy[0, 23] == 2.0 and busy[0, 0] == 2.0 and busy[0, 1] == 1.0
+    assert busy.sum() == pytest.approx(2 * 2.5)
+
+
+def test_energy_is_conserved():
+    result = simulate_stations([station(), station(station_type="Level 2 (AC 240V)", connectors=2)], TARIFF, 2025)
+    for simulated in result["stations"]:
+        assert simulated["energy_kwh"] == pytest.approx(simulated["sessions_served"] * 30, rel=1e-4)
+        assert simulated["sessions_served"] + simulated["sessions_lost"] == pytest.approx(
+            simulated["sessions_offered"], abs=0.2
+        )
+        assert sum(simulated["average_daily_load_kw"]) * 365 == pytest.approx(simulated["energy_kwh"], rel=1e-3)
+    assert result["hours_simulated"] == HOURS_PER_YEAR
+
+
+def test_more_connectors_reduce_queueing_loss():
+    result = simulate_stations(
+        [station(connectors=1), station(connectors=4), station(connectors=40)], TARIFF, 2025
+    )
+    losses = [simulated["loss_rate"] for simulated in result["stations"]]
+    assert losses[0] > losses[1] > losses[2]
+    assert losses[2] < 1e-4
+
+
+def test_margin_accounts_for_every_cost():
+    simulated = simulate_stations([station(fixed_costs_monthly=100)], TARIFF, 2025)["stations"][0]
+    costs = simulated["energy_cost"] + simulated["demand_charges"] + simulated["fixed_costs"]
+    assert simulated["margin"] == pytest.approx(simulated["revenue"] - costs, abs=0.05)
+    assert 0.12 < simulated["effective_energy_cost_per_kwh"] < 0.30
+    assert simulated["peak_demand_kw"] <= 4 * 50
+
+
+def test_sessions_longer_than_limit_are_rejected():
+    with pytest.raises(ValueError):
+        simulate_stations([station(station_type="Level 1 (AC 120V)", average_session_kwh=200)], TARIFF, 2025)
@@ -0,0 +1,198 @@
+import asyncio
+import time
+
+from pymongo.errors import AutoReconnect
+
+from write_behind import WriteBehindBuffer
+
+
+class FakeCollection:
+    def __init__(self, delay: float = 0.0):
+        self.documents = []
+        self.delay = delay
+        self.writing = asyncio.Event()
+
+    async def insert_one(self, document):
+        self.documents.append(document)
+
+    async def insert_many(self, documents, ordered=True):
+        self.writing.set()
+        await asyncio.sleep(self.delay)
+        self.documents.extend(documents)
+
+
+class UnreachableCollection(FakeCollection):
+    """Fails like a database that is down, until ``failures`` attempts have been made"""
+
+    def __init__(self, failures=None):
+        super().__init__()
+        self.failures = failures
+        self.attempts = 0
+
+    async def insert_many(self, documents, ordered=True):
+        self.attempts += 1
+        if self.failures is None or self.attempts <= self.failures:
+            raise AutoReconnect("connection refused")
+        await super().insert_many(documents, ordered)
+
+
+class FakeDatabase(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+
+def make_buffer(batch_size=500, interval=60.0, max_queue=10000, shutdown_timeout=10.0):
+    buffer = WriteBehindBuffer()
+    buffer.configure(enabled=True, max_batch_size=batch_size, flush_interval_seconds=interval, max_queue=max_queue,
+                     shutdown_timeout_seconds=shutdown_timeout)
+    flushed = []
+
+    async def hook(documents):
+        flushed.extend(documents)
+
+    buffer.on_flush("locations", hook)
+    return buffer, flushed
+
+
+def test_flushes_when_batch_size_is_reached():
+    async def run():
+        db = FakeDatabase()
+        buffer, flushed = make_buffer(batch_size=3)
+        await buffer.start(db)
+        for i in range(3):
+            await buffer.insert("locations", {"id": i})
+        await asyncio.sleep(0.05)
+        stats = buffer.stats()
+        await buffer.stop()
+        return db, flushed, stats
+
+    db, flushed, stats = asyncio.run(run())
+    assert [doc["id"] for doc in db["locations"].documents] == [0, 1, 2]
+    assert [doc["id"] for doc in flushed] == [0, 1, 2]
+    assert stats["flushes"] == 1
+    assert stats["queued"] == 0
+
+
+def test_flushes_partial_batch_on_interval():
+    async def run():
+        db = FakeDatabase()
+        buffer, _ = make_buffer(interval=0.02)
+        await buffer.start(db)
+        await buffer.insert("locations", {"id": 1})
+        queued = buffer.queued
+        await asyncio.sleep(0.1)
+        written = len(db["locations"].documents)
+        await buffer.stop()
+        return queued, written
+
+    assert asyncio.run(run()) == (1, 1)
+
+
+def test_falls_back_to_synchronous_write_when_queue_is_full():
+    async def run():
+        db = FakeDatabase()
+        buffer, flushed = make_buffer(max_queue=2)
+        await buffer.start(db)
+        for i in range(3):
+            await buffer.insert("locations", {"id": i})
+        written_before_stop = [doc["id"] for doc in db["locations"].documents]
+        await buffer.stop()
+        return written_before_stop, buffer.stats(), len(db["locations"].documents)
+
+    written_before_stop, stats, written = asyncio.run(run())
+    assert written_before_stop == [2]
+    assert stats["sync_fallbacks"] == 1
+    assert written == 3
+
+
+def test_stop_flushes_queued_documents():
+    async def run():
+        db = FakeDatabase()
+        buffer, flushed = make_buffer()
+        await buffer.start(db)
+        for i in range(5):
+            await buffer.insert("locations", {"id": i})
+        await buffer.stop()
+        return db, flushed, buffer.stats()
+
+    db, flushed, stats = asyncio.run(run())
+    assert len(db["locations"].documents) == 5
+    assert len(flushed) == 5
+    assert stats["queued"] == 0
+
+
+def test_stop_during_in_flight_flush_loses_nothing():
+    async def run():
+        db = FakeDatabase()
+        db["locations"] = FakeCollection(delay=0.1)
+        buffer, flushed = make_buffer(interval=0.01)
+        await buffer.start(db)
+        await buffer.insert("locations", {"id": 1})
+        await buffer.insert("locations", {"id": 2})
+        await asyncio.wait_for(db["locations"].writing.wait(), 1)
+        # Queued while the first batch is still being written
+        await buffer.insert("locations", {"id": 3})
+        await buffer.stop()
+        return db, flushed, buffer.stats()
+
+    db, flushed, stats = asyncio.run(run())
+    assert sorted(doc["id"] for doc in db["locations"].documents) == [1, 2, 3]
+    assert sorted(doc["id"] for doc in flushed) == [1, 2, 3]
+    assert stats["queued"] == 0
+    assert stats["flushed_documents"] == 3
+
+
+def test_disabled_buffer_writes_synchronously():
+    async def run():
+        db = FakeDatabase()
+        buffer = WriteBehindBuffer()
+        await buffer.start(db)
+        await buffer.insert("market_data", {"id": 1})
+        return db, buffer.stats()
+
+    db, stats = asyncio.run(run())
+    assert len(db["market_data"].documents) == 1
+    assert stats["sync_writes"] == 1
+
+
+def test_outage_retries_with_backoff_and_recovers():
+    async def run():
+        db = FakeDatabase()
+        db["locations"] = UnreachableCollection(failures=3)
+        buffer, flushed = make_buffer(interval=0.01)
+        await buffer.start(db)
+        await buffer.insert("locations", {"id": 1})
+        # Backoff doubles from 10 ms: retries after ~10, 20, 40 and 80 ms
+        await asyncio.sleep(0.3)
+        attempts = db["locations"].attempts
+        await buffer.stop()
+        return db, flushed, attempts, buffer.stats()
+
+    db, flushed, attempts, stats = asyncio.run(run())
+    assert attempts == 4
+    assert [doc["id"] for doc in db["locations"].documents] == [1]
+    assert [doc["id"] for doc in flushed] == [1]
+    assert stats["failed_flushes"] == 3
+    assert stats["failed_documents"] == 0
+
+
+def test_stop_gives_up_after_shutdown_timeout_during_outage():
+    async def run():
+        db = FakeDatabase()
+        db["locations"] = UnreachableCollection()
+        buffer, flushed = make_buffer(interval=0.01, shutdown_timeout=0.2)
+        await buffer.start(db)
+        await buffer.insert("locations", {"id": 1})
+        await buffer.insert("locations", {"id": 2})
+        await asyncio.sleep(0.1)
+        started = time.monotonic()
+        await buffer.stop()
+        return time.monotonic() - started, db["locations"].attempts, flushed, buffer.stats()
+
+    elapsed, attempts, flushed, stats = asyncio.run(run())
+    assert elapsed < 0.5
+    assert attempts < 15
+    assert flushed == []
+    assert stats["abandoned_documents"] == 2
+    assert stats["queued"] == 0